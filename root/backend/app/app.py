@@ -1,24 +1,41 @@
 import os
 from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-
-from sqlalchemy.ext.asyncio import AsyncEngine
-
-from app.db import User, Measurement, Base, engine
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app import email_outbox, idempotency, live, metrics, partitions, replica, write_coalescer
+from app.response_cache import response_cache
+from app.user_cache import user_cache
+from app.db import (
+    DB_POOL_WARMUP,
+    User,
+    Measurement,
+    Base,
+    async_session_maker,
+    check_schema_revision,
+    engine,
+    get_async_session,
+    pool_status,
+    replica_engine,
+    warm_up_pool,
+)
 from app.routers.measurements import measurement_router
 from app.routers.fhir import fhir_router
 from app.routers.auth import auth_router
 from app.routers.otp import otp_router as otp_router
 from app.schemas import UserCreate, UserRead, UserUpdate
 from app.users import (
+    GOOGLE_OAUTH_ENABLED,
     SECRET,
     auth_backend,
     current_active_user,
     fastapi_users,
-    google_oauth_client,
+    get_google_oauth_client,
 )
 
 
@@ -26,17 +43,57 @@ from app.users import (
 async def lifespan(app: FastAPI):
     # Create DB schema at startup (dev convenience)
     auto_create = os.getenv("AUTO_CREATE_DB_SCHEMA", "true").strip().lower() in ("1", "true", "yes")
-    if auto_create:
+    # create, check (only verify the migrated revision: fast cold start) or skip
+    schema_startup = os.getenv("DB_SCHEMA_STARTUP", "create" if auto_create else "skip").strip().lower()
+    if schema_startup == "create":
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+    elif schema_startup == "check":
+        await check_schema_revision()
+    if partitions.MEASUREMENTS_PARTITIONED and engine.dialect.name == "postgresql":
+        # Keep the next months' partitions ready so inserts don't fall into the default partition,
+        # now and periodically for as long as the process runs
+        await partitions.ensure_upcoming(engine)
+        partitions.maintainer = partitions.PartitionMaintainer(engine)
+        partitions.maintainer.start()
+    await warm_up_pool(DB_POOL_WARMUP)
+    # Deliver queued OTP emails in the background (disable for processes that shouldn't send)
+    run_worker = os.getenv("EMAIL_OUTBOX_WORKER", "true").strip().lower() in ("1", "true", "yes")
+    transport = email_outbox.default_transport() if run_worker else None
+    if transport is not None:
+        email_outbox.worker = email_outbox.OutboxWorker(async_session_maker, transport)
+        email_outbox.worker.start()
+    await live.broker.start(live.default_backend(engine))
+    if write_coalescer.WRITE_COALESCING_ENABLED:
+        write_coalescer.writer = write_coalescer.MeasurementWriter(async_session_maker)
+        write_coalescer.writer.start()
     try:
         yield
     finally:
+        if write_coalescer.writer is not None:
+            # New requests write directly; the writer commits what is already queued
+            writer, write_coalescer.writer = write_coalescer.writer, None
+            await writer.stop()
+        await live.broker.stop()
+        if partitions.maintainer is not None:
+            await partitions.maintainer.stop()
+            partitions.maintainer = None
+        if email_outbox.worker is not None:
+            await email_outbox.worker.stop()
+            email_outbox.worker = None
         await engine.dispose()
+        if replica_engine is not None:
+            await replica_engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
 
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(engine.sync_engine)
+    if replica_engine is not None:
+        metrics.instrument_engine(replica_engine.sync_engine)
+
 # Configure CORS from env (comma-separated). Support "*"/"all" to allow any origin in dev.
 cors_from_env = os.getenv("CORS_ORIGINS")
 allow_all_origins = False
@@ -64,6 +121,7 @@ if allow_all_origins:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Link", "ETag", idempotency.REPLAYED_HEADER],
     )
 else:
     app.add_middleware(
@@ -72,6 +130,7 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Link", "ETag", idempotency.REPLAYED_HEADER],
     )
 
 app.include_router(
@@ -98,18 +157,20 @@ app.include_router(
     tags=["users"],
 )
 # Automatically associate OAuth2 credentials with users based on
-app.include_router(
-    fastapi_users.get_oauth_router(google_oauth_client, auth_backend, SECRET, associate_by_email=True,
-                                   is_verified_by_default=True, redirect_url=os.getenv("GOOGLE_REDIRECT_URI")),
-    prefix="/auth/google",
-    tags=["auth"],
-)
+if GOOGLE_OAUTH_ENABLED:
+    app.include_router(
+        fastapi_users.get_oauth_router(get_google_oauth_client(), auth_backend, SECRET, associate_by_email=True,
+                                       is_verified_by_default=True, redirect_url=os.getenv("GOOGLE_REDIRECT_URI")),
+        prefix="/auth/google",
+        tags=["auth"],
+    )
 
 app.include_router(otp_router, prefix="/auth", tags=["auth"]) 
 
 app.include_router(measurement_router, prefix="/measurements", tags=["measurements"]) 
 
-# FHIR-compatible endpoints (minimal Observation + Patient)
+# FHIR-compatible endpoints (minimal Observation + Patient). Imported eagerly: the router costs
+# ~10 ms of a ~1 s cold import (python -m app.startup_profile); bulk export loads on first use
 app.include_router(fhir_router, prefix="/fhir", tags=["fhir"]) 
 
 # JSON login endpoint with detailed error messages
@@ -121,6 +182,46 @@ async def authenticated_route(user: User = Depends(current_active_user)):
     return {"message": f"Hello {user.email}!"}
 
 
+@app.get("/ready")
+async def readiness(session: AsyncSession = Depends(get_async_session)):
+    """
+    Readiness probe: 200 when the database answers, 503 otherwise, with live pool
+    counters (and replica / response cache / user cache counters when those are enabled).
+    A failing replica doesn't fail the probe since reads fall back to the primary.
+    """
+    try:
+        await session.execute(text("SELECT 1"))
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "detail": str(e), "pool": pool_status(session.bind.pool)},
+        )
+    body = {"status": "ok", "pool": pool_status(session.bind.pool)}
+    if replica_engine is not None:
+        body["replica"] = {"available": replica.replica_available(), "pool": pool_status(replica_engine.pool)}
+    if response_cache.enabled:
+        body["response_cache"] = response_cache.stats()
+    if user_cache.ttl > 0:
+        body["user_cache"] = user_cache.stats()
+    return body
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition; 404 unless METRICS_ENABLED."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    engines = [("primary", engine), ("replica", replica_engine)]
+    for name, bound in engines:
+        if bound is None:
+            continue
+        status = pool_status(bound.pool)
+        for state in ("checked_out", "idle", "overflow"):
+            if state in status:
+                metrics.db_pool_connections.set(status[state], name, state)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/")
 async def redirect_to_docs():
     return RedirectResponse(url="/docs")
@@ -0,0 +1,279 @@
+"""
+FHIR Bulk Data ($export) jobs.
+
+Each job is a directory under EXPORT_DIR, and everything about it is kept
+there, so any app process sharing EXPORT_DIR can report or delete it:
+
+- ``job.json``: host and pid of the process that queued it
+- ``progress.json``: rows written and a heartbeat, refreshed by the running export
+- ``manifest.json`` or ``error.txt`` once it has finished
+
+Exports run in a separate process pool (spawned, EXPORT_WORKERS processes), so
+encoding millions of rows never holds the serving process' GIL. Deleting the
+directory cancels a job: the export checks for it before every chunk. A
+running job whose heartbeat is older than EXPORT_STALE_SECONDS, or a queued one
+whose process is gone, is reported as failed.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db import Measurement
+from app.fhir_encoder import Builder, ObservationEncoder
+
+logger = logging.getLogger("app.export")
+
+# FHIR Bulk Data ($export) output directory; one sub-directory per job
+EXPORT_DIR = Path(os.getenv("EXPORT_DIR", "./exports"))
+# Rows fetched per server-side cursor round trip
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+# Concurrent export jobs; each runs in its own process with its own DB connection
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "1"))
+# Seconds between progress/heartbeat writes of a running export
+EXPORT_HEARTBEAT_SECONDS = float(os.getenv("EXPORT_HEARTBEAT_SECONDS", "5"))
+# A running export without a heartbeat for this long is reported as failed
+EXPORT_STALE_SECONDS = float(os.getenv("EXPORT_STALE_SECONDS", "120"))
+
+MANIFEST = "manifest.json"
+ERROR = "error.txt"
+OUTPUT = "Observation.ndjson"
+JOB = "job.json"
+PROGRESS = "progress.json"
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: a fresh interpreter, not a fork of the serving process and its event loop
+        _executor = ProcessPoolExecutor(max_workers=EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def job_dir(job_id: str) -> Optional[Path]:
+    """Directory of an existing job, or None. Rejects anything that isn't a job id."""
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return None
+    path = EXPORT_DIR / job_id
+    return path if path.is_dir() else None
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    # Readers in other processes never see a half-written file
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def _write_error(path: Path, message: str) -> None:
+    try:
+        (path / ERROR).write_text(message)
+    except FileNotFoundError:
+        pass  # deleted meanwhile
+
+
+def start_export(db_url: URL, request_url: str, build_bp: Builder, build_hr: Builder) -> str:
+    """Create a job directory and queue the export. Returns the job id."""
+    job_id = str(uuid.uuid4())
+    path = EXPORT_DIR / job_id
+    path.mkdir(parents=True)
+    _write_json(path / JOB, {"host": socket.gethostname(), "pid": os.getpid(), "queued": time.time()})
+    future = _pool().submit(
+        _export_process, job_id, str(path), db_url.render_as_string(hide_password=False), request_url,
+        build_bp, build_hr,
+    )
+    future.add_done_callback(lambda f: _export_done(f, job_id, path))
+    return job_id
+
+
+def _export_done(future: Future, job_id: str, path: Path) -> None:
+    # The export records its own errors; this catches a pool that broke before or while running it
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Bulk export process failed: job=%s: %s", job_id, future.exception())
+        if path.is_dir() and not (path / MANIFEST).exists() and not (path / ERROR).exists():
+            _write_error(path, f"Export process failed: {future.exception()}")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _stale_reason(path: Path) -> Optional[str]:
+    try:
+        progress = json.loads((path / PROGRESS).read_text())
+    except FileNotFoundError:
+        progress = None
+    if progress is not None:
+        if time.time() - progress["heartbeat"] > EXPORT_STALE_SECONDS:
+            return "Export worker stopped responding"
+        return None
+    try:
+        job = json.loads((path / JOB).read_text())
+    except FileNotFoundError:
+        return None
+    # Still queued: only the host that queued it can tell whether its process is gone
+    if job["host"] == socket.gethostname() and not _process_alive(job["pid"]):
+        return "Export was queued by a process that has exited"
+    return None
+
+
+def job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    ``{"state": "done", "manifest": ...}``, ``{"state": "error", ...}``,
+    ``{"state": "running", ...}`` or None. Manifest output URLs are file names;
+    the status route turns them into download URLs.
+    """
+    path = job_dir(job_id)
+    if path is None:
+        return None
+    if (path / MANIFEST).exists():
+        return {"state": "done", "manifest": json.loads((path / MANIFEST).read_text())}
+    if (path / ERROR).exists():
+        return {"state": "error", "message": (path / ERROR).read_text()}
+    reason = _stale_reason(path)
+    if reason is not None:
+        logger.warning("Bulk export is stale: job=%s: %s", job_id, reason)
+        _write_error(path, reason)
+        return {"state": "error", "message": reason}
+    try:
+        rows = json.loads((path / PROGRESS).read_text())["rows"]
+    except FileNotFoundError:
+        rows = None
+    return {"state": "running", "rows": rows}
+
+
+def delete_job(job_id: str) -> bool:
+    """Remove the job's files; an export still running stops before its next chunk."""
+    path = job_dir(job_id)
+    if path is None:
+        return False
+    # Renamed first, so a heartbeat racing the removal can't leave the job directory behind
+    trash = EXPORT_DIR / f".deleted-{job_id}"
+    try:
+        os.replace(path, trash)
+    except FileNotFoundError:
+        return False
+    shutil.rmtree(trash, ignore_errors=True)
+    return True
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _check_cancelled(path: Path) -> None:
+    if not path.is_dir():
+        raise ExportCancelled(path.name)
+
+
+def _export_process(
+    job_id: str, path: str, db_url: str, request_url: str, build_bp: Builder, build_hr: Builder
+) -> None:
+    """Entry point in the export process."""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_export(job_id, Path(path), db_url, request_url, build_bp, build_hr))
+
+
+async def _heartbeat(path: Path, progress: Dict[str, int]) -> None:
+    while True:
+        try:
+            _write_json(path / PROGRESS, {"rows": progress["rows"], "heartbeat": time.time()})
+        except FileNotFoundError:
+            return  # deleted; the export notices at its next chunk
+        await asyncio.sleep(EXPORT_HEARTBEAT_SECONDS)
+
+
+async def _run_export(
+    job_id: str,
+    path: Path,
+    db_url: str,
+    request_url: str,
+    build_bp: Builder,
+    build_hr: Builder,
+) -> None:
+    """
+    Stream every measurement out of a server-side cursor into NDJSON, with its
+    own engine so it holds no connections from the serving pool. A job deleted
+    meanwhile stops before its next chunk and leaves nothing behind.
+    """
+    transaction_time = datetime.now(timezone.utc).isoformat()
+    engine = create_async_engine(db_url, poolclass=NullPool)
+    stmt = (
+        select(
+            Measurement.user_id,
+            Measurement.id,
+            Measurement.timestamp,
+            Measurement.systolic,
+            Measurement.diastolic,
+            Measurement.pulse,
+        )
+        .order_by(Measurement.user_id, Measurement.timestamp.desc(), Measurement.id.desc())
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    progress = {"rows": 0}
+    heartbeat = None
+    try:
+        _check_cancelled(path)
+        heartbeat = asyncio.create_task(_heartbeat(path, progress))
+        with open(path / OUTPUT, "wb") as out:
+            async with engine.connect() as conn:
+                result = await conn.stream(stmt)
+                encoder_user = None
+                encoder = None
+                async for chunk in result.partitions():
+                    _check_cancelled(path)
+                    lines = []
+                    for user_id, meas_id, ts, systolic, diastolic, pulse in chunk:
+                        if user_id != encoder_user:
+                            encoder_user = user_id
+                            encoder = ObservationEncoder(user_id, build_bp, build_hr)
+                        lines.append(encoder.ndjson_lines(meas_id, ts, systolic, diastolic, pulse))
+                    out.write(b"".join(lines))
+                    progress["rows"] += len(chunk)
+        _check_cancelled(path)
+        manifest = {
+            "transactionTime": transaction_time,
+            "request": request_url,
+            "requiresAccessToken": True,
+            "output": [{"type": "Observation", "url": OUTPUT, "count": 2 * progress["rows"]}],
+            "error": [],
+        }
+        _write_json(path / MANIFEST, manifest)
+        logger.info("Bulk export finished: job=%s measurements=%s", job_id, progress["rows"])
+    except (ExportCancelled, FileNotFoundError) as e:
+        if path.is_dir():
+            logger.exception("Bulk export failed: job=%s", job_id)
+            _write_error(path, str(e))
+        else:
+            logger.info("Bulk export cancelled: job=%s measurements=%s", job_id, progress["rows"])
+    except Exception as e:
+        logger.exception("Bulk export failed: job=%s", job_id)
+        _write_error(path, str(e))
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+        await engine.dispose()
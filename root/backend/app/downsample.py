@@ -0,0 +1,42 @@
+from typing import List, Sequence
+
+# Upper bound for GET /measurements/bp/series?points=N; wider than any chart is in pixels
+MAX_SERIES_POINTS = 5000
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], points: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets: indices of ``points`` samples that keep the
+    visual shape of the series (xs ascending). First and last samples are always
+    kept; from every bucket in between the sample forming the largest triangle
+    with the previous pick and the next bucket's mean is chosen.
+    """
+    n = len(xs)
+    if points >= n or points < 3:
+        return list(range(n))
+
+    every = (n - 2) / (points - 2)
+    picked = [0]
+    a = 0
+    for i in range(points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - end
+        avg_x = sum(xs[end:next_end]) / span
+        avg_y = sum(ys[end:next_end]) / span
+
+        ax, ay = xs[a], ys[a]
+        dx, dy = avg_x - ax, avg_y - ay
+        best = start
+        best_area = -1.0
+        for j in range(start, end):
+            # Twice the triangle area; the factor doesn't change the argmax
+            area = abs(dx * (ys[j] - ay) - (xs[j] - ax) * dy)
+            if area > best_area:
+                best_area = area
+                best = j
+        picked.append(best)
+        a = best
+    picked.append(n - 1)
+    return picked
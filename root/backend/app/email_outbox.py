@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Protocol
+
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import metrics
+from app.db import EmailOutbox
+
+logger = logging.getLogger("app.email")
+
+# Seconds between outbox polls when nothing wakes the worker earlier
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "5"))
+# Emails claimed per drain round
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+# Delivery attempts before an email is given up on
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+# Retry delay is EMAIL_RETRY_BASE_SECONDS * 2^(attempts - 1), capped at EMAIL_RETRY_MAX_SECONDS
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "5"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "600"))
+# Claimed emails are skipped by other workers this long; if the claiming worker dies, they are retried after it
+EMAIL_CLAIM_SECONDS = float(os.getenv("EMAIL_CLAIM_SECONDS", "600"))
+
+
+class EmailSendError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class EmailTransport(Protocol):
+    async def send(self, to_email: str, subject: str, html: str) -> Optional[str]:
+        """Deliver one email, return the provider id. Raise EmailSendError on failure."""
+        ...
+
+    async def aclose(self) -> None: ...
+
+
+class LogTransport:
+    """Local transport: logs and keeps the messages instead of sending them (dev/tests)."""
+
+    def __init__(self):
+        self.sent: List[Dict[str, str]] = []
+
+    async def send(self, to_email: str, subject: str, html: str) -> Optional[str]:
+        self.sent.append({"to": to_email, "subject": subject, "html": html})
+        logger.info("Email not sent (local transport): to=%s subject=%s", to_email, subject)
+        return None
+
+    async def aclose(self) -> None:
+        pass
+
+
+class ResendTransport:
+    """Resend HTTP API over one pooled keep-alive client."""
+
+    def __init__(self, api_key: str, send_from: str, client: Optional[httpx.AsyncClient] = None):
+        self.send_from = send_from
+        self._api_key = api_key
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Built on the first send: creating it loads the CA bundle, which would otherwise add to startup
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url="https://api.resend.com",
+                headers={"Authorization": f"Bearer {self._api_key}"},
+                timeout=15,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                # Connection-level retries; response-level ones go through the outbox backoff
+                transport=httpx.AsyncHTTPTransport(retries=2),
+            )
+        return self._client
+
+    async def send(self, to_email: str, subject: str, html: str) -> Optional[str]:
+        payload = {"from": self.send_from, "to": [to_email], "subject": subject, "html": html}
+        try:
+            resp = await self.client.post("/emails", json=payload)
+        except httpx.HTTPError as e:
+            raise EmailSendError(f"Email send exception: {e}")
+        if resp.status_code not in (200, 201):
+            # Resend returns JSON with an error message
+            try:
+                detail = resp.json()
+            except Exception:
+                detail = {"message": resp.text}
+            retryable = resp.status_code == 429 or resp.status_code >= 500
+            raise EmailSendError(f"Email send failed ({resp.status_code}): {detail}", retryable=retryable)
+        try:
+            return resp.json().get("id")
+        except Exception:
+            return None
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+
+
+def default_transport() -> Optional[EmailTransport]:
+    """
+    ResendTransport when SEND_EMAILS is on, LogTransport otherwise. None when
+    sending is on but Resend isn't configured: then no worker runs and the
+    emails stay queued until a configured process picks them up.
+    """
+    send_emails = os.getenv("SEND_EMAILS", "true").strip().lower() not in ("0", "false", "no")
+    if not send_emails:
+        return LogTransport()
+    api_key = os.getenv("RESEND_API_KEY")
+    send_from = os.getenv("SEND_FROM")
+    if not api_key or not send_from or not send_from.strip():
+        logger.error("Email service not configured (RESEND_API_KEY/SEND_FROM missing); emails stay queued")
+        return None
+    return ResendTransport(api_key, send_from.strip())
+
+
+def enqueue(session: AsyncSession, to_email: str, subject: str, html: str) -> None:
+    """Add an email to the outbox. It is stored when the caller commits ``session``."""
+    session.add(EmailOutbox(to_email=to_email, subject=subject, html=html))
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), EMAIL_RETRY_MAX_SECONDS))
+
+
+class OutboxWorker:
+    """
+    Background task draining email_outbox. Due rows are claimed with
+    FOR UPDATE SKIP LOCKED and pushed EMAIL_CLAIM_SECONDS into the future in a
+    short transaction, so several app processes can run a worker each. The
+    emails are then sent with no transaction or connection held, and the
+    outcomes are recorded in a second short transaction.
+    """
+
+    def __init__(self, session_maker, transport: EmailTransport):
+        self.session_maker = session_maker
+        self.transport = transport
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="email-outbox")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.transport.aclose()
+
+    def notify(self) -> None:
+        """Drain now instead of at the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.drain_once() == EMAIL_BATCH_SIZE:
+                    pass
+            except Exception:
+                logger.exception("Email outbox drain failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def drain_once(self) -> int:
+        """Send the due emails of one batch. Returns how many were attempted."""
+        now = datetime.now(timezone.utc)
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(EmailOutbox)
+                .where(EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(EMAIL_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            claimed = result.scalars().all()
+            for row in claimed:
+                row.attempts += 1
+                row.next_attempt_at = now + timedelta(seconds=EMAIL_CLAIM_SECONDS)
+            await session.commit()
+
+        # expire_on_commit=False: the claimed rows keep their loaded values
+        outcomes = [(row, await self._send(row)) for row in claimed]
+
+        if outcomes:
+            async with self.session_maker() as session:
+                for row, values in outcomes:
+                    await session.execute(update(EmailOutbox).where(EmailOutbox.id == row.id).values(**values))
+                await session.commit()
+        return len(claimed)
+
+    async def _send(self, row: EmailOutbox) -> Dict[str, Any]:
+        """Deliver one claimed email; returns the column values recording the outcome."""
+        try:
+            provider_id = await self.transport.send(row.to_email, row.subject, row.html)
+        except Exception as e:
+            if getattr(e, "retryable", True) and row.attempts < EMAIL_MAX_ATTEMPTS:
+                metrics.otp_emails.inc("retry")
+                logger.warning("Email to=%s failed (attempt %s), retrying: %s", row.to_email, row.attempts, e)
+                next_attempt_at = datetime.now(timezone.utc) + retry_delay(row.attempts)
+            else:
+                metrics.otp_emails.inc("failed")
+                logger.error("Email to=%s given up after %s attempts: %s", row.to_email, row.attempts, e)
+                next_attempt_at = None
+            return {"last_error": str(e), "next_attempt_at": next_attempt_at}
+        metrics.otp_emails.inc("sent")
+        logger.info("Email sent: to=%s id=%s", row.to_email, provider_id)
+        return {"sent_at": datetime.now(timezone.utc), "next_attempt_at": None, "last_error": None}
+
+
+# Started by the app lifespan; None when the worker is disabled
+worker: Optional[OutboxWorker] = None
+
+
+def notify() -> None:
+    if worker is not None:
+        worker.notify()
@@ -0,0 +1,68 @@
+"""
+Conditional GET for the measurement lists.
+
+Every user has a version counter in ``measurement_versions`` that writers bump
+in the same transaction as their change. The list endpoints send it as a strong
+ETag, and a matching ``If-None-Match`` costs one primary-key lookup instead of
+the list query.
+"""
+import uuid
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import MeasurementVersion
+
+# Clients may keep the list but must revalidate it before use
+CACHE_CONTROL = "private, no-cache"
+
+
+async def bump(session: AsyncSession, user_id: uuid.UUID) -> None:
+    """Increment the user's version; the caller commits it together with the change."""
+    await bump_many(session, [user_id])
+
+
+async def bump_many(session: AsyncSession, user_ids: Iterable[uuid.UUID]) -> None:
+    """``bump`` for several users in one statement (sorted, so concurrent writers lock rows in the same order)."""
+    insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(MeasurementVersion).values([{"user_id": u, "version": 1} for u in sorted(set(user_ids))])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MeasurementVersion.user_id],
+        set_={"version": MeasurementVersion.version + 1},
+    )
+    await session.execute(stmt)
+
+
+async def current_etag(session: AsyncSession, user_id: uuid.UUID) -> str:
+    """
+    Strong ETag for the user's measurements. The user id is part of it so a
+    client switching accounts never revalidates another user's copy.
+    Read it before the list query: a write in between then only makes the
+    ETag older than the body, which costs a refetch, never a stale 304.
+    """
+    version = await session.scalar(
+        select(MeasurementVersion.version).where(MeasurementVersion.user_id == user_id)
+    )
+    return f'"{user_id.hex}.{version or 0}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the request already has the current version, else None."""
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
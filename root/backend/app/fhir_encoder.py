@@ -0,0 +1,69 @@
+import json
+import re
+import uuid
+from types import SimpleNamespace
+from typing import Any, Callable, Dict
+
+# Placeholders run through the resource builders when compiling a template.
+# Integers are rendered quoted by json.dumps, so their quotes are stripped again.
+_SLOT_RE = re.compile(r'"__slot_(sys|dia|pulse)__"|__slot_(id|ts)__')
+
+Builder = Callable[[Any, uuid.UUID], Dict[str, Any]]
+
+
+def dumps(obj: Any) -> str:
+    """Compact JSON in the same form FastAPI's JSONResponse produces."""
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _compile(text: str) -> str:
+    """Turn dumped template JSON into a %-format string with named slots."""
+
+    def repl(match: "re.Match[str]") -> str:
+        if match.group(1):
+            return f"%({match.group(1)})d"
+        return f"%({match.group(2)})s"
+
+    return _SLOT_RE.sub(repl, text.replace("%", "%%"))
+
+
+class ObservationEncoder:
+    """
+    Emits FHIR searchset entries as JSON bytes straight from measurement rows.
+
+    The constant parts (coding, category, units, subject) are rendered once by
+    running the regular resource builders over placeholder values; per row only
+    id, timestamp and the three readings are spliced in. The output is
+    byte-for-byte what ``dumps`` gives for the builder dicts.
+    """
+
+    def __init__(self, user_id: uuid.UUID, build_bp: Builder, build_hr: Builder):
+        proto = SimpleNamespace(
+            id="__slot_id__",
+            timestamp=SimpleNamespace(isoformat=lambda: "__slot_ts__"),
+            systolic="__slot_sys__",
+            diastolic="__slot_dia__",
+            pulse="__slot_pulse__",
+        )
+        bp, hr = build_bp(proto, user_id), build_hr(proto, user_id)
+        pair = (
+            dumps({"fullUrl": f"urn:uuid:{proto.id}", "resource": bp})
+            + ","
+            + dumps({"fullUrl": f"urn:uuid:{proto.id}-hr", "resource": hr})
+        )
+        self._fmt = _compile(pair)
+        self._ndjson_fmt = _compile(dumps(bp) + "\n" + dumps(hr) + "\n")
+
+    def entry_pair(self, meas_id: Any, timestamp: Any, systolic: int, diastolic: int, pulse: int) -> bytes:
+        """The BP panel entry and heart-rate entry of one measurement, comma separated."""
+        return (
+            self._fmt
+            % {"id": meas_id, "ts": timestamp.isoformat(), "sys": systolic, "dia": diastolic, "pulse": pulse}
+        ).encode()
+
+    def ndjson_lines(self, meas_id: Any, timestamp: Any, systolic: int, diastolic: int, pulse: int) -> bytes:
+        """The BP panel and heart-rate resources of one measurement as two NDJSON lines."""
+        return (
+            self._ndjson_fmt
+            % {"id": meas_id, "ts": timestamp.isoformat(), "sys": systolic, "dia": diastolic, "pulse": pulse}
+        ).encode()
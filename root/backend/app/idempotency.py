@@ -0,0 +1,159 @@
+"""
+Idempotent measurement creation.
+
+A client names a measurement with an ``Idempotency-Key`` header (or, for FHIR,
+the Observation's ``identifier``). The first request claims the key with
+``INSERT ... ON CONFLICT DO NOTHING RETURNING`` in the same transaction as the
+measurement; a retry finds the key with one primary-key lookup and gets the
+original measurement back instead of a duplicate. A hash of the measurement
+is stored with the key, so reusing a key for different data is rejected. It
+covers the measurement's fields rather than the request body, so the same
+reading retried through another endpoint (``/measurements/bp``, a FHIR
+Observation, a Bundle entry) is recognised as a retry.
+
+Requests that create several measurements (``/bp/batch``, batch and
+transaction Bundles) claim one key per measurement with ``claim_many``: the
+header key suffixed with the item's index, or a BP panel's identifier.
+"""
+import hashlib
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import MeasurementClientKey
+
+MAX_KEY_LENGTH = 255
+# Keys per lookup/INSERT statement, well under the bind parameter limits of Postgres and SQLite
+CLAIM_CHUNK_SIZE = 1000
+# Set on responses that repeat an earlier result
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def request_key(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = value.strip()
+    if not value or len(value) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="INVALID_IDEMPOTENCY_KEY")
+    return value
+
+
+def fhir_identifier_key(resource: Dict[str, Any]) -> Optional[str]:
+    """``system|value`` of the Observation's first identifier that has a value."""
+    identifiers: List[Any] = resource.get("identifier") or []
+    for identifier in identifiers:
+        if isinstance(identifier, dict) and identifier.get("value"):
+            return request_key(f"{identifier.get('system') or ''}|{identifier['value']}")
+    return None
+
+
+def item_key(key: str, index: int) -> str:
+    """Key of the ``index``-th measurement of a request keyed with ``key``."""
+    return request_key(f"{key}#{index}")
+
+
+def fingerprint(body: Any) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def measurement_fingerprint(row: Dict[str, Any], timestamp: Optional[datetime]) -> str:
+    """
+    Hash of the measurement ``row`` as the client sent it. ``timestamp`` is the
+    client's own (None when the server filled in the current time), so a retry
+    hashes the same.
+    """
+    if timestamp is not None and timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return fingerprint(
+        {
+            "systolic": row["systolic"],
+            "diastolic": row["diastolic"],
+            "pulse": row["pulse"],
+            "timestamp": timestamp.isoformat() if timestamp is not None else None,
+            "notes": row.get("notes"),
+            "tags": row.get("tags") or [],
+        }
+    )
+
+
+def batch_fingerprint(measurement_hashes: List[str]) -> str:
+    """
+    Hash of all measurements of a request (their ``measurement_fingerprint``s in
+    order), stored with every key derived from its ``Idempotency-Key``: the
+    retry has to be the whole request again.
+    """
+    return fingerprint(measurement_hashes)
+
+
+async def _lookup(session: AsyncSession, user_id: uuid.UUID, keys: List[str]) -> Dict[str, MeasurementClientKey]:
+    taken = {}
+    for start in range(0, len(keys), CLAIM_CHUNK_SIZE):
+        result = await session.execute(
+            select(MeasurementClientKey).where(
+                MeasurementClientKey.user_id == user_id,
+                MeasurementClientKey.key.in_(keys[start:start + CLAIM_CHUNK_SIZE]),
+            )
+        )
+        taken.update((claimed.key, claimed) for claimed in result.scalars())
+    return taken
+
+
+def replay(claimed: MeasurementClientKey, request_hash: str) -> uuid.UUID:
+    """The measurement of an earlier claim, if it was made for the same body."""
+    if claimed.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="IDEMPOTENCY_KEY_REUSED")
+    return claimed.measurement_id
+
+
+async def claim_many(
+    session: AsyncSession, user_id: uuid.UUID, claims: Dict[str, Tuple[str, uuid.UUID]]
+) -> Dict[str, MeasurementClientKey]:
+    """
+    Reserve each key of ``claims`` (key -> (request_hash, measurement_id)) in
+    the caller's transaction, with one lookup and one multi-row INSERT per
+    CLAIM_CHUNK_SIZE keys.
+    Returns the earlier claim of every key that was already taken; the caller
+    checks it with ``replay`` and must not insert that measurement.
+    """
+    if not claims:
+        return {}
+    taken = await _lookup(session, user_id, list(claims))
+    fresh = [
+        {"user_id": user_id, "key": key, "request_hash": request_hash, "measurement_id": measurement_id}
+        for key, (request_hash, measurement_id) in claims.items()
+        if key not in taken
+    ]
+    insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    inserted = set()
+    for start in range(0, len(fresh), CLAIM_CHUNK_SIZE):
+        stmt = (
+            insert(MeasurementClientKey)
+            .values(fresh[start:start + CLAIM_CHUNK_SIZE])
+            .on_conflict_do_nothing(index_elements=[MeasurementClientKey.user_id, MeasurementClientKey.key])
+            .returning(MeasurementClientKey.key)
+        )
+        inserted.update((await session.execute(stmt)).scalars())
+    raced = [row["key"] for row in fresh if row["key"] not in inserted]
+    if raced:
+        # Concurrent requests with the same keys committed first (Postgres waited for them)
+        taken.update(await _lookup(session, user_id, raced))
+    return taken
+
+
+async def claim(
+    session: AsyncSession, user_id: uuid.UUID, key: str, request_hash: str, measurement_id: uuid.UUID
+) -> Optional[uuid.UUID]:
+    """
+    Reserve ``key`` for ``measurement_id`` in the caller's transaction. Returns
+    None when the caller should go on and insert the measurement, or the id
+    stored by an earlier request with the same key and body.
+    """
+    taken = await claim_many(session, user_id, {key: (request_hash, measurement_id)})
+    return replay(taken[key], request_hash) if key in taken else None
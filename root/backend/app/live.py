@@ -0,0 +1,290 @@
+"""
+Live measurement events for ``GET /measurements/bp/events`` (Server-Sent Events).
+
+Write paths call ``publish`` with their session before they commit, so an
+event goes out exactly when its change does. The event goes through a backend
+to the broker of every worker (``LocalBackend`` within one process,
+``PostgresBackend`` over LISTEN/NOTIFY across processes), and each broker
+encodes it once and hands the same bytes to that user's subscriptions.
+
+A subscription is a bounded buffer plus an ``asyncio.Event``, so an idle one
+costs a parked generator and nothing else. When a consumer falls
+LIVE_QUEUE_SIZE events behind, its buffer is dropped and it gets a single
+``resync`` event instead, telling the client to refetch the list; a slow
+client never grows the worker's memory or holds up anyone else.
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from app import metrics
+
+logger = logging.getLogger("app.live")
+
+# local (one process) or postgres (LISTEN/NOTIFY, for several workers)
+LIVE_EVENTS_BACKEND = os.getenv("LIVE_EVENTS_BACKEND", "local").strip().lower()
+# Events buffered per subscription before it is told to resync
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))
+# Comment line sent to idle streams so proxies keep them open
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+# Open streams per user (tabs, dashboards); further ones get 429
+LIVE_MAX_SUBSCRIPTIONS_PER_USER = int(os.getenv("LIVE_MAX_SUBSCRIPTIONS_PER_USER", "10"))
+# Larger writes (bulk imports and deletes) are announced as a resync
+LIVE_MAX_EVENT_ITEMS = int(os.getenv("LIVE_MAX_EVENT_ITEMS", "100"))
+
+CHANNEL = "measurement_events"
+# Postgres rejects NOTIFY payloads from 8000 bytes on
+NOTIFY_MAX_BYTES = 7900
+# Session.info key of the events LocalBackend holds until the commit
+PENDING_KEY = "live_events"
+# Session.info key of the types of all events published in the open transaction, counted on commit
+PUBLISHED_KEY = "live_event_types"
+
+Deliver = Callable[[uuid.UUID, str, Dict[str, Any]], None]
+
+
+def measurement_item(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A ``measurements`` row in the shape GET /measurements/bp lists it."""
+    return {
+        "id": str(row["id"]),
+        "userId": str(row["user_id"]),
+        "systolic": row["systolic"],
+        "diastolic": row["diastolic"],
+        "pulse": row["pulse"],
+        "timestamp": row["timestamp"].isoformat(),
+        "tags": row.get("tags") or [],
+        "notes": row.get("notes"),
+    }
+
+
+def encode(event_type: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+RESYNC = encode("resync", {})
+HEARTBEAT = b": keepalive\n\n"
+
+
+class Subscription:
+    __slots__ = ("user_id", "events", "wake", "overflowed")
+
+    def __init__(self, user_id: uuid.UUID):
+        self.user_id = user_id
+        self.events: Deque[bytes] = deque()
+        self.wake = asyncio.Event()
+        self.overflowed = False
+
+    def push(self, event: bytes) -> None:
+        if self.overflowed:
+            return
+        if len(self.events) >= LIVE_QUEUE_SIZE:
+            # Slow consumer: whatever it missed, one resync covers it
+            self.events.clear()
+            self.overflowed = True
+            metrics.live_resyncs.inc()
+        else:
+            self.events.append(event)
+        self.wake.set()
+
+
+class LocalBackend:
+    """
+    Delivers within this process only; enough for a single worker. Events wait
+    on the session until its transaction commits and are dropped on rollback.
+    """
+
+    async def start(self, deliver: Deliver, resync_all: Callable[[], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, session: AsyncSession, user_id: uuid.UUID, event_type: str, data: Dict[str, Any]) -> None:
+        session.info.setdefault(PENDING_KEY, []).append((user_id, event_type, data))
+
+    async def stop(self) -> None:
+        pass
+
+
+class PostgresBackend:
+    """
+    NOTIFY on ``CHANNEL`` inside the writer's own transaction, which Postgres
+    delivers on commit and discards on rollback; every worker LISTENs on one
+    dedicated asyncpg connection and feeds its broker, its own events
+    included. If that connection drops, it reconnects with backoff and then
+    tells every local subscriber to resync, since events may have been missed.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self._conn = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self, deliver: Deliver, resync_all: Callable[[], None]) -> None:
+        self._deliver = deliver
+        self._resync_all = resync_all
+        await self._listen()
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        dsn = self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._conn = await asyncpg.connect(dsn)
+        await self._conn.add_listener(CHANNEL, self._receive)
+        self._conn.add_termination_listener(self._lost)
+
+    def _receive(self, conn, pid, channel, payload: str) -> None:
+        message = json.loads(payload)
+        self._deliver(uuid.UUID(message["user"]), message["type"], message["data"])
+
+    def _lost(self, conn) -> None:
+        if not self._stopping:
+            logger.warning("Live events listener connection lost, reconnecting")
+            self._reconnect = asyncio.get_running_loop().create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        delay = 1.0
+        while not self._stopping:
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.warning("Live events listener reconnect failed, retrying in %ss: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            self._resync_all()
+            return
+
+    async def publish(self, session: AsyncSession, user_id: uuid.UUID, event_type: str, data: Dict[str, Any]) -> None:
+        payload = json.dumps({"user": user_id.hex, "type": event_type, "data": data}, separators=(",", ":"))
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            payload = json.dumps({"user": user_id.hex, "type": "resync", "data": {}})
+        await session.execute(select(func.pg_notify(CHANNEL, payload)))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._conn is not None:
+            await self._conn.close()
+
+
+class Broker:
+    def __init__(self, backend=None):
+        self.backend = backend or LocalBackend()
+        self._subscriptions: Dict[uuid.UUID, Set[Subscription]] = {}
+        self._started = False
+
+    async def start(self, backend=None) -> None:
+        if backend is not None:
+            self.backend = backend
+        await self.backend.start(self.deliver, self.resync_all)
+        self._started = True
+
+    async def stop(self) -> None:
+        if self._started:
+            await self.backend.stop()
+            self._started = False
+
+    def subscribe(self, user_id: uuid.UUID) -> Optional[Subscription]:
+        """A new subscription, or None when the user already has the maximum open."""
+        subscriptions = self._subscriptions.setdefault(user_id, set())
+        if len(subscriptions) >= LIVE_MAX_SUBSCRIPTIONS_PER_USER:
+            return None
+        subscription = Subscription(user_id)
+        subscriptions.add(subscription)
+        metrics.live_subscribers.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+        metrics.live_subscribers.dec()
+
+    def deliver(self, user_id: uuid.UUID, event_type: str, data: Dict[str, Any]) -> None:
+        subscriptions = self._subscriptions.get(user_id)
+        if not subscriptions:
+            return
+        # Encoded once, whatever the number of subscribers
+        event = RESYNC if event_type == "resync" else encode(event_type, data)
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def resync_all(self) -> None:
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.push(RESYNC)
+
+    async def publish(self, session: AsyncSession, user_id: uuid.UUID, event_type: str, data: Dict[str, Any]) -> None:
+        """Announce a change made in ``session``'s open transaction; it goes out when that commits."""
+        await self.backend.publish(session, user_id, event_type, data)
+        session.info.setdefault(PUBLISHED_KEY, []).append(event_type)
+
+
+async def event_stream(subscription: Subscription, ready: Dict[str, Any]) -> AsyncGenerator[bytes, None]:
+    """SSE body: a ``ready`` event, then the subscription's events and heartbeats until the client leaves."""
+    try:
+        yield encode("ready", ready)
+        while True:
+            try:
+                await asyncio.wait_for(subscription.wake.wait(), LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+            subscription.wake.clear()
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield RESYNC
+            while subscription.events:
+                yield subscription.events.popleft()
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def default_backend(engine: AsyncEngine):
+    if LIVE_EVENTS_BACKEND == "postgres" and engine.dialect.name == "postgresql":
+        return PostgresBackend(engine)
+    return LocalBackend()
+
+
+broker = Broker()
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(session: Session) -> None:
+    for user_id, event_type, data in session.info.pop(PENDING_KEY, ()):
+        broker.deliver(user_id, event_type, data)
+    # Counted here, not in publish: a rolled back write announced nothing
+    for event_type in session.info.pop(PUBLISHED_KEY, ()):
+        metrics.live_events.inc(event_type)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(PUBLISHED_KEY, None)
+
+
+async def publish_created(session: AsyncSession, user_id: uuid.UUID, rows: List[Dict[str, Any]]) -> None:
+    if len(rows) > LIVE_MAX_EVENT_ITEMS:
+        await broker.publish(session, user_id, "resync", {})
+    else:
+        await broker.publish(session, user_id, "created", {"items": [measurement_item(row) for row in rows]})
+
+
+async def publish_deleted(session: AsyncSession, user_id: uuid.UUID, ids: Iterable[uuid.UUID]) -> None:
+    ids = [str(i) for i in ids]
+    if len(ids) > LIVE_MAX_EVENT_ITEMS:
+        await broker.publish(session, user_id, "resync", {})
+    else:
+        await broker.publish(session, user_id, "deleted", {"ids": ids})
@@ -0,0 +1,213 @@
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Install the HTTP middleware, SQL timing events and GET /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+# Distinct SQL fingerprints tracked; further statements are counted as "other"
+METRICS_MAX_STATEMENTS = int(os.getenv("METRICS_MAX_STATEMENTS", "200"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_label_str(self.labels, key)} {_fmt(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        self._values[label_values] = value
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two additions."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Labels, List] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="%s"' % bound
+                yield f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}"
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_label_str(self.labels, key)} {_fmt(total)}"
+            yield f"{self.name}_count{_label_str(self.labels, key)} {cumulative}"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being handled")
+db_query_latency = Histogram(
+    "db_query_duration_seconds", "SQL execution time by statement fingerprint", ("statement",), QUERY_BUCKETS
+)
+otp_emails = Counter("otp_emails_total", "OTP email delivery attempts by result", ("result",))
+logins = Counter("logins_total", "Password logins by result", ("result",))
+measurements_inserted = Counter("measurements_inserted_total", "Stored measurements by entry point", ("source",))
+response_cache_requests = Counter("response_cache_requests_total", "Response cache lookups by result", ("result",))
+response_cache_bytes = Gauge("response_cache_bytes", "Bytes held by the in-process response cache")
+user_cache_requests = Counter("user_cache_requests_total", "Authenticated user lookups by cache result", ("result",))
+db_read_sessions = Counter("db_read_sessions_total", "Sessions handed to read-only routes by engine", ("engine",))
+db_replica_fallbacks = Counter("db_replica_fallbacks_total", "Reads moved to the primary because the replica failed")
+db_pool_connections = Gauge("db_pool_connections", "Pool connections by engine and state", ("engine", "state"))
+live_subscribers = Gauge("live_subscribers", "Open live event streams in this process")
+live_events = Counter("live_events_total", "Live measurement events published by committed writes, by type", ("type",))
+live_resyncs = Counter("live_resyncs_total", "Live subscriptions that fell behind and were told to resync")
+coalesced_batch_rows = Histogram(
+    "coalesced_write_batch_rows", "Measurements per coalesced INSERT + COMMIT", buckets=SIZE_BUCKETS
+)
+coalesced_commit_latency = Histogram("coalesced_write_commit_seconds", "Insert and commit time of a coalesced batch")
+coalesced_queue_wait = Histogram(
+    "coalesced_write_queue_wait_seconds", "Time a measurement waited in the write queue before its batch started"
+)
+
+REGISTRY = [
+    http_requests, http_latency, http_in_flight, db_query_latency, otp_emails, logins, measurements_inserted,
+    response_cache_requests, response_cache_bytes, user_cache_requests, db_read_sessions, db_replica_fallbacks,
+    db_pool_connections,
+    coalesced_batch_rows, coalesced_commit_latency, coalesced_queue_wait,
+    live_subscribers, live_events, live_resyncs,
+]
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body wrapping) recording latency
+    and status per route template, e.g. ``/measurements/bp/{measurement_id}``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_in_flight.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            http_in_flight.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, route, status)
+            http_latency.observe(elapsed, method, route)
+
+
+_VALUES_GROUPS = re.compile(r"(\([^()]*\))(?:\s*,\s*\([^()]*\))+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_fingerprints: Dict[str, str] = {}
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Statement text with multi-row VALUES and IN lists collapsed, so an executemany
+    of 10 or 10000 rows share one series. Memoized per distinct statement text.
+    """
+    fp = _fingerprints.get(statement)
+    if fp is None:
+        fp = _WHITESPACE.sub(" ", statement).strip()
+        fp = _IN_LIST.sub("IN (...)", fp)
+        fp = _VALUES_GROUPS.sub(r"\1, ...", fp)
+        if len(_fingerprints) < 10 * METRICS_MAX_STATEMENTS:
+            _fingerprints[statement] = fp
+    return fp
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    fp = fingerprint(statement)
+    if (fp,) not in db_query_latency._series and len(db_query_latency._series) >= METRICS_MAX_STATEMENTS:
+        fp = "other"
+    db_query_latency.observe(elapsed, fp)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every cursor execution of ``engine`` (pass ``AsyncEngine.sync_engine``)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
@@ -0,0 +1,69 @@
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+
+from app.db import Measurement
+
+# Upper bound for a single page, regardless of what the client asks for
+MAX_PAGE_SIZE = 1000
+# Page size of listings requested without a limit
+DEFAULT_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp: datetime, measurement_id: uuid.UUID) -> str:
+    """Encode the keyset position (timestamp, id) of the last row on a page as an opaque token."""
+    raw = f"{timestamp.isoformat()}|{measurement_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Decode a cursor produced by encode_cursor. Raises 400 INVALID_CURSOR on garbage."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts_raw, id_raw = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(ts_raw), uuid.UUID(id_raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="INVALID_CURSOR")
+
+
+def measurement_page_query(
+    stmt: Select,
+    user_id: uuid.UUID,
+    from_ts: Optional[datetime] = None,
+    to_ts: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Select:
+    """
+    Apply the user/time-range filters, keyset position and ordering for a
+    newest-first page of measurements. Served by ix_measurements_user_id_timestamp.
+
+    When ``limit`` is given one extra row is fetched so the caller can tell
+    whether a next page exists (see split_page).
+    """
+    stmt = stmt.where(Measurement.user_id == user_id)
+    if from_ts is not None:
+        stmt = stmt.where(Measurement.timestamp >= from_ts)
+    if to_ts is not None:
+        stmt = stmt.where(Measurement.timestamp < to_ts)
+    if cursor:
+        ts, last_id = decode_cursor(cursor)
+        # Row-value comparison so Postgres can use it as an index condition
+        stmt = stmt.where(tuple_(Measurement.timestamp, Measurement.id) < tuple_(ts, last_id))
+    stmt = stmt.order_by(Measurement.timestamp.desc(), Measurement.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def split_page(rows: list, limit: Optional[int]) -> Tuple[list, Optional[str]]:
+    """Trim the look-ahead row and return (page_rows, next_cursor)."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last.timestamp, last.id)
@@ -0,0 +1,293 @@
+"""
+Monthly range partitioning of ``measurements`` on Postgres.
+
+The partitioned layout is opt-in: ``alembic -x partitioned=true upgrade head``
+(or MEASUREMENTS_PARTITIONED=true) converts the table of a new database, and
+``python -m app.partitions convert`` converts an existing one in place, leaving
+every other table and the Alembic revision alone. With
+MEASUREMENTS_PARTITIONED=true the app creates upcoming monthly partitions at
+startup and then every MEASUREMENTS_PARTITION_CHECK_SECONDS while it runs
+(``PartitionMaintainer``). The same operations are available from the command
+line:
+
+    python -m app.partitions convert [months_ahead]
+    python -m app.partitions list
+    python -m app.partitions ensure [months_ahead]
+    python -m app.partitions detach 2020-01 [archive_schema]
+
+Functions take a synchronous Connection (Alembic's ``op.get_bind()``, or
+``AsyncConnection.run_sync``) and leave transaction handling to the caller.
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger("app.partitions")
+
+PARENT = "measurements"
+DEFAULT_PARTITION = "measurements_default"
+# Secondary index of later migrations (0004) that the conversions carry over
+TAGS_INDEX = "ix_measurements_tags"
+# Opt-in flag shared by the 0002 migration and startup maintenance
+MEASUREMENTS_PARTITIONED = os.getenv("MEASUREMENTS_PARTITIONED", "false").strip().lower() in ("1", "true", "yes")
+# Monthly partitions kept ready ahead of the current month
+PARTITION_MONTHS_AHEAD = int(os.getenv("MEASUREMENTS_PARTITION_MONTHS_AHEAD", "3"))
+# How often a running app checks that the upcoming partitions exist
+PARTITION_CHECK_SECONDS = float(os.getenv("MEASUREMENTS_PARTITION_CHECK_SECONDS", "86400"))
+# pg_advisory_xact_lock key, so app processes don't create the same partition at once
+MAINTENANCE_LOCK_KEY = 0x6D656173
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def _bound(month: date) -> str:
+    # Partition bounds are DDL and can't be bind parameters; month comes from date arithmetic only
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def _scalar(conn: Connection, sql: str, params: Optional[dict] = None):
+    result = conn.execute(text(sql), params or {})
+    # Alembic offline mode (--sql) only prints statements and returns no result
+    return result.scalar() if result is not None else None
+
+
+def _has_index(conn: Connection, name: str) -> bool:
+    return _scalar(conn, "SELECT to_regclass(:name) IS NOT NULL", {"name": name})
+
+
+def _create_tags_index(conn: Connection) -> None:
+    conn.execute(text(f"CREATE INDEX {TAGS_INDEX} ON {PARENT} USING gin (tags jsonb_path_ops)"))
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(_scalar(
+        conn, "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))", {"t": PARENT}
+    ))
+
+
+def list_partitions(conn: Connection) -> List[Tuple[str, str]]:
+    """(partition name, bound expression) of every attached partition."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:t) ORDER BY c.relname"
+    ), {"t": PARENT})
+    return [(name, bound) for name, bound in rows]
+
+
+def create_month_partition(conn: Connection, month: date) -> bool:
+    """
+    Attach the partition for ``month`` unless it exists. Rows of that month that
+    landed in the default partition are moved into it first, so ATTACH succeeds.
+    """
+    month = month_start(month)
+    name = partition_name(month)
+    if _scalar(conn, "SELECT to_regclass(:n)", {"n": name}) is not None:
+        return False
+    start, end = month, add_months(month, 1)
+    conn.execute(text(f'CREATE TABLE "{name}" (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    params = {"start": datetime(start.year, start.month, 1, tzinfo=timezone.utc),
+              "end": datetime(end.year, end.month, 1, tzinfo=timezone.utc)}
+    in_month = '"timestamp" >= :start AND "timestamp" < :end'
+    conn.execute(text(f'INSERT INTO "{name}" SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}'), params)
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"), params)
+    conn.execute(text(
+        f'ALTER TABLE {PARENT} ATTACH PARTITION "{name}" FOR VALUES FROM ({_bound(start)}) TO ({_bound(end)})'
+    ))
+    return True
+
+
+def ensure_partitions(conn: Connection, months_ahead: int = PARTITION_MONTHS_AHEAD,
+                      today: Optional[date] = None) -> List[str]:
+    """Create the partitions from the current month up to ``months_ahead`` months later."""
+    current = month_start(today or datetime.now(timezone.utc).date())
+    created = []
+    for i in range(months_ahead + 1):
+        month = add_months(current, i)
+        if create_month_partition(conn, month):
+            created.append(partition_name(month))
+    if created:
+        logger.info("Created measurement partitions: %s", ", ".join(created))
+    return created
+
+
+async def ensure_upcoming(engine: AsyncEngine, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """ensure_partitions in its own transaction, one process at a time; nothing unless partitioned."""
+    async with engine.begin() as conn:
+        if not await conn.run_sync(is_partitioned):
+            return []
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+        return await conn.run_sync(ensure_partitions, months_ahead)
+
+
+class PartitionMaintainer:
+    """
+    Background task re-running ensure_upcoming every PARTITION_CHECK_SECONDS,
+    so a process that runs for months keeps creating partitions ahead of the
+    rows instead of filling the default partition.
+    """
+
+    def __init__(self, engine: AsyncEngine, interval: float = PARTITION_CHECK_SECONDS):
+        self.engine = engine
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="partition-maintenance")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await ensure_upcoming(self.engine)
+            except Exception:
+                logger.exception("Partition maintenance failed")
+
+
+def detach_partition(conn: Connection, month: date, archive_schema: Optional[str] = "archive") -> str:
+    """
+    Detach a month from ``measurements``: a catalog change, no rows are copied.
+    The table is moved to ``archive_schema`` (kept queryable, easy to dump or drop),
+    or left in place when ``archive_schema`` is None.
+    """
+    name = partition_name(month_start(month))
+    conn.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION "{name}"'))
+    if archive_schema:
+        conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"'))
+        conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{archive_schema}"'))
+    return name
+
+
+def convert_to_partitioned(conn: Connection, months_ahead: int = PARTITION_MONTHS_AHEAD) -> None:
+    """
+    Rebuild ``measurements`` as a table range-partitioned by month on ``timestamp``.
+    The primary key becomes (id, timestamp) since it has to include the partition key.
+    Other tables are untouched, so this also works on a database at any later revision.
+    """
+    tags_index = _has_index(conn, TAGS_INDEX)
+    if tags_index:
+        conn.execute(text(f"DROP INDEX {TAGS_INDEX}"))
+    conn.execute(text(f"ALTER TABLE {PARENT} RENAME TO {PARENT}_unpartitioned"))
+    conn.execute(text(f"ALTER TABLE {PARENT}_unpartitioned RENAME CONSTRAINT {PARENT}_pkey TO {PARENT}_unpartitioned_pkey"))
+    conn.execute(text("ALTER INDEX ix_measurements_user_id_timestamp RENAME TO ix_measurements_unpartitioned_user_id_timestamp"))
+    conn.execute(text(f'''
+        CREATE TABLE {PARENT} (
+            id UUID NOT NULL,
+            user_id UUID NOT NULL REFERENCES "user" (id),
+            systolic INTEGER NOT NULL,
+            diastolic INTEGER NOT NULL,
+            pulse INTEGER NOT NULL,
+            "timestamp" TIMESTAMP WITH TIME ZONE NOT NULL,
+            tags JSONB,
+            notes VARCHAR,
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    '''))
+    # Declared once on the parent, created on every partition
+    conn.execute(text(f'CREATE INDEX ix_measurements_user_id_timestamp ON {PARENT} (user_id, "timestamp" DESC, id DESC)'))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+
+    oldest = _scalar(conn, f'SELECT min("timestamp") FROM {PARENT}_unpartitioned')
+    current = month_start(datetime.now(timezone.utc).date())
+    month = month_start(oldest.astimezone(timezone.utc).date()) if oldest is not None else current
+    while month <= add_months(current, months_ahead):
+        create_month_partition(conn, month)
+        month = add_months(month, 1)
+
+    conn.execute(text(f"INSERT INTO {PARENT} SELECT * FROM {PARENT}_unpartitioned"))
+    conn.execute(text(f"DROP TABLE {PARENT}_unpartitioned"))
+    if tags_index:
+        _create_tags_index(conn)
+    conn.execute(text(f"ANALYZE {PARENT}"))
+
+
+def convert_to_plain(conn: Connection) -> None:
+    """Inverse of convert_to_partitioned (migration downgrade)."""
+    tags_index = _has_index(conn, TAGS_INDEX)
+    if tags_index:
+        conn.execute(text(f"DROP INDEX {TAGS_INDEX}"))
+    conn.execute(text(f"ALTER TABLE {PARENT} RENAME TO {PARENT}_partitioned"))
+    conn.execute(text("ALTER INDEX ix_measurements_user_id_timestamp RENAME TO ix_measurements_partitioned_user_id_timestamp"))
+    conn.execute(text(f"ALTER TABLE {PARENT}_partitioned RENAME CONSTRAINT {PARENT}_pkey TO {PARENT}_partitioned_pkey"))
+    conn.execute(text(f'''
+        CREATE TABLE {PARENT} (
+            id UUID NOT NULL PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES "user" (id),
+            systolic INTEGER NOT NULL,
+            diastolic INTEGER NOT NULL,
+            pulse INTEGER NOT NULL,
+            "timestamp" TIMESTAMP WITH TIME ZONE NOT NULL,
+            tags JSONB,
+            notes VARCHAR
+        )
+    '''))
+    conn.execute(text(f"INSERT INTO {PARENT} SELECT * FROM {PARENT}_partitioned"))
+    conn.execute(text(f'CREATE INDEX ix_measurements_user_id_timestamp ON {PARENT} (user_id, "timestamp" DESC, id DESC)'))
+    conn.execute(text(f"DROP TABLE {PARENT}_partitioned CASCADE"))
+    if tags_index:
+        _create_tags_index(conn)
+
+
+async def _cli(argv: List[str]) -> None:
+    from app.db import engine
+
+    command = argv[0] if argv else "list"
+    async with engine.begin() as conn:
+        if command == "convert":
+            if await conn.run_sync(is_partitioned):
+                raise SystemExit(f"{PARENT} is already partitioned")
+            ahead = int(argv[1]) if len(argv) > 1 else PARTITION_MONTHS_AHEAD
+            await conn.run_sync(convert_to_partitioned, ahead)
+            print(f"{PARENT} converted")
+        elif not await conn.run_sync(is_partitioned):
+            raise SystemExit(f"{PARENT} is not partitioned (see python -m app.partitions convert)")
+        elif command == "list":
+            for name, bound in await conn.run_sync(list_partitions):
+                print(f"{name}\t{bound}")
+        elif command == "ensure":
+            ahead = int(argv[1]) if len(argv) > 1 else PARTITION_MONTHS_AHEAD
+            created = await conn.run_sync(ensure_partitions, ahead)
+            print("created: " + (", ".join(created) or "nothing"))
+        elif command == "detach":
+            month = datetime.strptime(argv[1], "%Y-%m").date()
+            schema = argv[2] if len(argv) > 2 else "archive"
+            print("detached: " + await conn.run_sync(detach_partition, month, schema))
+        else:
+            raise SystemExit(__doc__)
+    await engine.dispose()
+
+
+# Started by the app lifespan when MEASUREMENTS_PARTITIONED is set on Postgres
+maintainer: Optional[PartitionMaintainer] = None
+
+
+if __name__ == "__main__":
+    asyncio.run(_cli(sys.argv[1:]))
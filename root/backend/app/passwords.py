@@ -0,0 +1,37 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
+from fastapi_users.password import PasswordHelperProtocol
+
+T = TypeVar("T")
+
+# Threads running password hashes (argon2/bcrypt release the GIL); 0 hashes inline on the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hash operations admitted at once; further logins wait here instead of piling onto the pool
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(max(1, 2 * PASSWORD_HASH_WORKERS))))
+
+_executor: Optional[ThreadPoolExecutor] = (
+    ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    if PASSWORD_HASH_WORKERS > 0
+    else None
+)
+_limit = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+
+
+async def _run(fn: Callable[..., T], *args) -> T:
+    async with _limit:
+        if _executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+async def hash_password(helper: PasswordHelperProtocol, password: str) -> str:
+    return await _run(helper.hash, password)
+
+
+async def verify_and_update(
+    helper: PasswordHelperProtocol, plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return await _run(helper.verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,89 @@
+"""
+Routing of read-only requests to the read replica (DATABASE_REPLICA_URL).
+
+Read routes take their session from ``read_session_dependency``. It hands out
+a replica session unless no replica is configured, the replica failed to
+connect within the last REPLICA_RETRY_SECONDS (then the primary serves the
+read), or the user wrote within the last REPLICA_STICKY_SECONDS, so a client
+reading right after its own write doesn't see replication lag. The sticky
+window is tracked per process.
+"""
+import logging
+import os
+import time
+import uuid
+from typing import AsyncGenerator, Callable, Dict
+
+from fastapi import Depends
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import db, metrics
+from app.db import User, get_async_session
+
+logger = logging.getLogger("app.replica")
+
+# Reads of a user go to the primary for this long after the user's last write
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+# After a failed replica connection, reads stay on the primary for this long
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+_recent_writes: Dict[uuid.UUID, float] = {}
+_replica_down_until = 0.0
+
+
+def note_write(user_id: uuid.UUID) -> None:
+    """Keep the user's reads on the primary for REPLICA_STICKY_SECONDS; call after committing a write."""
+    if db.replica_session_maker is None:
+        return
+    now = time.monotonic()
+    if len(_recent_writes) > 10000:
+        for key in [k for k, until in _recent_writes.items() if until < now]:
+            del _recent_writes[key]
+    _recent_writes[user_id] = now + REPLICA_STICKY_SECONDS
+
+
+def _use_primary(user_id: uuid.UUID) -> bool:
+    if db.replica_session_maker is None:
+        return True
+    now = time.monotonic()
+    if now < _replica_down_until:
+        return True
+    until = _recent_writes.get(user_id)
+    return until is not None and now < until
+
+
+def replica_available() -> bool:
+    return db.replica_session_maker is not None and time.monotonic() >= _replica_down_until
+
+
+def read_session_dependency(user_dependency: Callable) -> Callable:
+    """
+    Session dependency for read-only routes authenticated by ``user_dependency``
+    (the same callable the route uses, so FastAPI resolves the user once).
+    The primary session is lazy: it only connects when it serves the request.
+    """
+
+    async def get_read_session(
+        user: User = Depends(user_dependency),
+        primary: AsyncSession = Depends(get_async_session),
+    ) -> AsyncGenerator[AsyncSession, None]:
+        global _replica_down_until
+        if _use_primary(user.id):
+            metrics.db_read_sessions.inc("primary")
+            yield primary
+            return
+        async with db.replica_session_maker() as session:
+            try:
+                # Connect up front so an unreachable replica is detected before the route runs
+                await session.connection()
+                connected = True
+            except (OSError, exc.DBAPIError, exc.TimeoutError) as e:
+                _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+                logger.warning("Read replica unavailable, using the primary for %ss: %s", REPLICA_RETRY_SECONDS, e)
+                metrics.db_replica_fallbacks.inc()
+                connected = False
+            metrics.db_read_sessions.inc("replica" if connected else "primary")
+            yield session if connected else primary
+
+    return get_read_session
@@ -0,0 +1,175 @@
+"""
+Opt-in cache of encoded measurement list responses.
+
+Entries are keyed by (user, endpoint, query params, measurement version). The
+version is the one behind the list ETags (app.etags), which every write bumps
+in its own transaction, so a write made by another worker makes the old entries
+unreachable even before they are evicted. The write paths also call
+``invalidate(user_id)`` after committing, which frees that user's entries in
+this process right away.
+"""
+import os
+import uuid
+from collections import OrderedDict
+from typing import AsyncGenerator, Dict, Hashable, Optional, Protocol, Set, Tuple
+
+from fastapi import Request
+
+from app import metrics
+
+# Cache list_bp / FHIR search responses
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+# Memory bound of the in-process backend (encoded bodies and headers)
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Bodies larger than this are served but not cached
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(4 * 1024 * 1024)))
+
+Key = Tuple[uuid.UUID, Hashable]
+# Encoded body and the headers that go with it (paging links)
+Entry = Tuple[bytes, Dict[str, str]]
+
+
+class ResponseCacheBackend(Protocol):
+    """
+    Storage interface. A shared backend (e.g. Redis) implements the same
+    methods; as keys carry the version, it stays correct without ``invalidate``,
+    which only releases memory early.
+    """
+
+    def get(self, key: Key) -> Optional[Entry]: ...
+
+    def set(self, key: Key, entry: Entry) -> None: ...
+
+    def invalidate(self, user_id: uuid.UUID) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for /ready; may be empty."""
+        ...
+
+
+def _entry_size(entry: Entry) -> int:
+    body, headers = entry
+    return len(body) + sum(len(k) + len(v) for k, v in headers.items())
+
+
+class InProcessBackend:
+    """LRU over entries, bounded by the total size of the stored bodies."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[Key, Entry]" = OrderedDict()
+        self._by_user: Dict[uuid.UUID, Set[Key]] = {}
+
+    def get(self, key: Key) -> Optional[Entry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Key, entry: Entry) -> None:
+        size = _entry_size(entry)
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = entry
+        self._by_user.setdefault(key[0], set()).add(key)
+        self._add_bytes(size)
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        for key in list(self._by_user.get(user_id, ())):
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._add_bytes(-self.bytes)
+        self._entries.clear()
+        self._by_user.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self.bytes}
+
+    def _remove(self, key: Key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._by_user[key[0]]
+        self._add_bytes(-_entry_size(entry))
+
+    def _add_bytes(self, amount: int) -> None:
+        self.bytes += amount
+        metrics.response_cache_bytes.inc(amount=amount)
+
+
+class ResponseCache:
+    def __init__(self, backend: ResponseCacheBackend, enabled: bool):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(request: Request, user_id: uuid.UUID, version: str) -> Key:
+        params = tuple(sorted(request.query_params.multi_items()))
+        # Host is part of the key since paging links in the body are absolute URLs
+        return user_id, (request.url.netloc, request.url.path, params, version)
+
+    def get(self, key: Key) -> Optional[Entry]:
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            metrics.response_cache_requests.inc("miss")
+        else:
+            self.hits += 1
+            metrics.response_cache_requests.inc("hit")
+        return entry
+
+    def set(self, key: Key, body: bytes, headers: Dict[str, str]) -> None:
+        if len(body) <= RESPONSE_CACHE_MAX_ENTRY_BYTES:
+            self.backend.set(key, (body, headers))
+
+    async def tee(
+        self, key: Key, chunks: AsyncGenerator[bytes, None], headers: Dict[str, str]
+    ) -> AsyncGenerator[bytes, None]:
+        """Pass a streamed body through and cache it once complete (unless it outgrows an entry)."""
+        parts: Optional[list] = []
+        size = 0
+        try:
+            async for chunk in chunks:
+                yield chunk
+                if parts is not None:
+                    size += len(chunk)
+                    if size <= RESPONSE_CACHE_MAX_ENTRY_BYTES:
+                        parts.append(chunk)
+                    else:
+                        parts = None
+        finally:
+            # A disconnecting client closes this generator; close the source too so it releases its session
+            await chunks.aclose()
+        if parts is not None:
+            self.set(key, b"".join(parts), headers)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        if self.enabled:
+            self.backend.invalidate(user_id)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self.backend.stats(),
+        }
+
+
+response_cache = ResponseCache(InProcessBackend(RESPONSE_CACHE_MAX_BYTES), RESPONSE_CACHE_ENABLED)
@@ -6,9 +6,11 @@ from pydantic import BaseModel, EmailStr
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import metrics, passwords
 from app.db import User, get_async_session
 from app.users import get_user_manager, get_jwt_strategy, UserManager
 from app.schemas import UserCreate
+from app.user_cache import user_cache
 from fastapi_users.exceptions import UserAlreadyExists, InvalidPasswordException
 
 
@@ -31,6 +33,7 @@ async def login_json(
     user = result.scalar_one_or_none()
 
     if not user:
+        metrics.logins.inc("failure")
         raise HTTPException(status_code=404, detail="USER_NOT_FOUND")
 
     if not user.is_active:
@@ -40,19 +43,22 @@ async def login_json(
         raise HTTPException(status_code=400, detail="USER_NOT_VERIFIED")
 
     # Verify password and update hashing scheme if needed
-    verified, updated_password_hash = user_manager.password_helper.verify_and_update(
-        payload.password, user.hashed_password
+    verified, updated_password_hash = await passwords.verify_and_update(
+        user_manager.password_helper, payload.password, user.hashed_password
     )
     if not verified:
+        metrics.logins.inc("failure")
         raise HTTPException(status_code=400, detail="INVALID_PASSWORD")
 
     if updated_password_hash is not None:
         user.hashed_password = updated_password_hash
         await session.commit()
+        user_cache.invalidate(user.id)
 
     # Issue JWT using the same strategy as the built-in router
     strategy = get_jwt_strategy()
     token = await strategy.write_token(user)
+    metrics.logins.inc("success")
     return {"access_token": token, "token_type": "bearer"}
 
 
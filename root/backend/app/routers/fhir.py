@@ -1,31 +1,46 @@
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import etags, idempotency, live, metrics, replica
 from app.db import Measurement, User, get_async_session
+from app.fhir_encoder import ObservationEncoder, dumps
+from app.measurement_encoder import SEARCHSET_COLUMNS
+from app.pagination import MAX_PAGE_SIZE, encode_cursor, measurement_page_query
+from app.response_cache import response_cache
 from app.users import fastapi_users
 
 fhir_router = APIRouter()
 
 current_active_verified_user = fastapi_users.current_user(active=True, verified=True)
+# System-level bulk export covers every patient, so it is limited to superusers
+current_superuser = fastapi_users.current_user(active=True, verified=True, superuser=True)
+# Searchset and $export read from the replica when one is configured (app.replica)
+get_read_session = replica.read_session_dependency(current_active_verified_user)
+get_export_read_session = replica.read_session_dependency(current_superuser)
+
+
+_VITAL_CATEGORY: List[Dict[str, Any]] = [
+    {
+        "coding": [
+            {
+                "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                "code": "vital-signs",
+                "display": "Vital Signs",
+            }
+        ]
+    }
+]
 
 
 def _vital_category() -> List[Dict[str, Any]]:
-    return [
-        {
-            "coding": [
-                {
-                    "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                    "code": "vital-signs",
-                    "display": "Vital Signs",
-                }
-            ]
-        }
-    ]
+    # Shared constant; resources are only serialized, never mutated
+    return _VITAL_CATEGORY
 
 
 def _observation_bp(meas: Measurement, user_id: uuid.UUID) -> Dict[str, Any]:
@@ -112,25 +127,92 @@ def _observation_hr(meas: Measurement, user_id: uuid.UUID) -> Dict[str, Any]:
     }
 
 
+# Rows pulled from the DB cursor per round trip while streaming a searchset
+STREAM_CHUNK_ROWS = 500
+
+
+async def _stream_searchset(
+    session: AsyncSession,
+    stmt,
+    user_id: uuid.UUID,
+    self_url: str,
+    next_url_for,
+    page_rows: Optional[int],
+    paged: bool,
+) -> AsyncIterator[bytes]:
+    """
+    Write a searchset Bundle entry by entry while rows come off a server-side cursor.
+    ``total`` and ``link`` go after ``entry`` since only then is it known whether
+    another page exists; JSON member order carries no meaning.
+    """
+    encoder = ObservationEncoder(user_id, _observation_bp, _observation_hr)
+    try:
+        yield b'{"resourceType":"Bundle","type":"searchset","entry":['
+        emitted = 0
+        last = None
+        has_more = False
+        # SEARCHSET_COLUMNS rows (id, timestamp, systolic, diastolic, pulse), no ORM objects
+        result = await session.stream(stmt.execution_options(yield_per=STREAM_CHUNK_ROWS))
+        async for row in result:
+            if page_rows is not None and emitted // 2 == page_rows:
+                has_more = True
+                break
+            pair = encoder.entry_pair(*row)
+            yield b"," + pair if emitted else pair
+            emitted += 2
+            last = row
+        await result.close()
+        links = [{"relation": "self", "url": self_url}]
+        if has_more and last is not None:
+            links.append({"relation": "next", "url": next_url_for(encode_cursor(last.timestamp, last.id))})
+        tail = "]"
+        if not paged:
+            # Only a complete result set knows its total without a COUNT query
+            tail += f',"total":{emitted}'
+        yield (tail + ',"link":' + dumps(links) + "}").encode()
+    finally:
+        await session.close()
+
+
 @fhir_router.get("/Observation")
 async def list_observations_fhir(
+    request: Request,
+    count: Optional[int] = Query(
+        default=None, alias="_count", ge=2, le=2 * MAX_PAGE_SIZE,
+        description="Maximum entries per page; they come in BP panel + heart rate pairs, so odd values round down",
+    ),
+    cursor: Optional[str] = Query(default=None, alias="_cursor", description="Opaque paging token from link.next"),
     user: User = Depends(current_active_verified_user),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    result = await session.execute(
-        select(Measurement).where(Measurement.user_id == user.id).order_by(Measurement.timestamp.desc())
-    )
-    measurements = result.scalars().all()
-    entries: List[Dict[str, Any]] = []
-    for m in measurements:
-        entries.append({"fullUrl": f"urn:uuid:{m.id}", "resource": _observation_bp(m, user.id)})
-        entries.append({"fullUrl": f"urn:uuid:{m.id}-hr", "resource": _observation_hr(m, user.id)})
-    return {
-        "resourceType": "Bundle",
-        "type": "searchset",
-        "total": len(entries),
-        "entry": entries,
-    }
+    """
+    Streams the user's vital-sign Observations as a searchset Bundle, newest first.
+    ``_count`` enables paging via ``link`` relation ``next``. It bounds the
+    entries of a page, never the BP panels: a page holds ``_count // 2`` pairs.
+    Answers 304 without querying when If-None-Match has the current ETag, and
+    serves the encoded Bundle from the response cache when enabled.
+    """
+    etag = await etags.current_etag(session, user.id)
+    cached = etags.not_modified(request, etag)
+    if cached is not None:
+        return cached
+    headers = {"ETag": etag, "Cache-Control": etags.CACHE_CONTROL}
+    cache_key = response_cache.key(request, user.id, etag) if response_cache.enabled else None
+    if cache_key is not None:
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            return Response(entry[0], media_type="application/json", headers=entry[1])
+    page_rows = count // 2 if count is not None else None
+    stmt = measurement_page_query(select(*SEARCHSET_COLUMNS), user.id, cursor=cursor, limit=page_rows)
+    paged = page_rows is not None or cursor is not None
+
+    def next_url_for(token: str) -> str:
+        return str(request.url.include_query_params(_cursor=token))
+
+    body = _stream_searchset(session, stmt, user.id, str(request.url), next_url_for, page_rows, paged)
+    if cache_key is not None:
+        body = response_cache.tee(cache_key, body, headers)
+    return StreamingResponse(body, media_type="application/json", headers=headers)
 
 
 def _find_code(codings: List[Dict[str, Any]], system: str, code: str) -> bool:
@@ -191,13 +273,207 @@ def _extract_hr_from(resource: Dict[str, Any]) -> Optional[int]:
     return None
 
 
+def _parse_effective(resource: Dict[str, Any]) -> Optional[datetime]:
+    effective = resource.get("effectiveDateTime")
+    if not effective:
+        return None
+    try:
+        return datetime.fromisoformat(effective)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid effectiveDateTime")
+
+
+def _outcome(message: str) -> Dict[str, Any]:
+    return {
+        "resourceType": "OperationOutcome",
+        "issue": [{"severity": "error", "code": "invalid", "diagnostics": message}],
+    }
+
+
+def _error_message(exc: Exception) -> str:
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return f"Invalid Observation: {exc}"
+
+
+def _entry_keys(entry: Dict[str, Any], resource: Dict[str, Any]) -> List[str]:
+    """References by which other entries may point at this one (hasMember)."""
+    keys = []
+    if entry.get("fullUrl"):
+        keys.append(entry["fullUrl"])
+    if resource.get("id"):
+        keys.append(f"Observation/{resource['id']}")
+    return keys
+
+
+async def _process_bundle(
+    payload: Dict[str, Any], user: User, session: AsyncSession, key: Optional[str], response: Response
+) -> Dict[str, Any]:
+    """
+    Handle a batch or transaction Bundle: every BP panel becomes one measurement,
+    paired with a heart rate from its own component, a ``hasMember`` reference,
+    or an HR Observation with the same effectiveDateTime (in that order).
+    All measurements are inserted with one multi-row INSERT in one commit.
+    A transaction fails as a whole on the first bad entry; a batch reports
+    per-entry outcomes and stores the rest.
+    Each panel is deduplicated by the request's ``key`` and its position, or
+    else by its ``identifier``; a repeated panel answers ``200 OK`` with the
+    Observation stored the first time.
+    """
+    bundle_type = payload["type"]
+    entries = payload.get("entry") or []
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(entries)
+    panels = []  # (index, resource, bp_data, pulse, member refs)
+    hr_by_key: Dict[str, int] = {}
+    hr_by_time: Dict[datetime, List[int]] = {}
+    hr_values: Dict[int, int] = {}
+
+    def fail(index: int, message: str, hr_index: Optional[int] = None) -> None:
+        if bundle_type == "transaction":
+            raise HTTPException(status_code=400, detail=f"Bundle entry {index}: {message}")
+        outcomes[index] = {"response": {"status": "400 Bad Request", "outcome": _outcome(message)}}
+        if hr_index is not None:
+            outcomes[hr_index] = outcomes[index]
+
+    for index, entry in enumerate(entries):
+        resource = entry.get("resource") if isinstance(entry, dict) else None
+        if not isinstance(resource, dict) or resource.get("resourceType") != "Observation":
+            fail(index, "Only Observation resources are supported")
+            continue
+        try:
+            bp_data = _parse_bp_observation(resource)
+            pulse = _extract_hr_from(resource)
+            effective = _parse_effective(resource) if bp_data is None else None
+        except Exception as e:
+            fail(index, _error_message(e))
+            continue
+        if bp_data is not None:
+            members = resource.get("hasMember", [])
+            if not isinstance(members, list):
+                fail(index, "hasMember must be a list of references")
+                continue
+            refs = [m.get("reference") for m in members if isinstance(m, dict)]
+            panels.append((index, resource, bp_data, pulse, refs))
+            continue
+        if pulse is None:
+            fail(index, "Observation is neither a BP panel (85354-9) nor a heart rate (8867-4)")
+            continue
+        hr_values[index] = pulse
+        for ref in _entry_keys(entry, resource):
+            hr_by_key[ref] = index
+        if effective is not None:
+            hr_by_time.setdefault(effective, []).append(index)
+
+    used: set[int] = set()
+    created = []  # (panel index, HR entry index, row, idempotency key, request hash)
+    for index, resource, bp_data, pulse, refs in panels:
+        hr_index = None
+        if pulse is None:
+            for ref in refs:
+                candidate = hr_by_key.get(ref)
+                if candidate is not None and candidate not in used:
+                    hr_index = candidate
+                    break
+            if hr_index is None:
+                for candidate in hr_by_time.get(bp_data["timestamp"], []):
+                    if candidate not in used:
+                        hr_index = candidate
+                        break
+            if hr_index is None:
+                fail(index, "Heart rate (LOINC 8867-4) is required")
+                continue
+            used.add(hr_index)
+            pulse = hr_values[hr_index]
+        row = {
+            "id": uuid.uuid4(),
+            "user_id": user.id,
+            "systolic": bp_data["systolic"],
+            "diastolic": bp_data["diastolic"],
+            "pulse": pulse,
+            "timestamp": bp_data["timestamp"],
+            "tags": [],
+            "notes": bp_data.get("notes"),
+        }
+        if key is not None:
+            claim_key = idempotency.item_key(key, index)
+        else:
+            try:
+                claim_key = idempotency.fhir_identifier_key(resource)
+            except HTTPException as e:
+                fail(index, _error_message(e), hr_index)
+                continue
+        # Hashes like the same reading posted alone or to /measurements/bp
+        request_hash = idempotency.measurement_fingerprint(row, _parse_effective(resource))
+        created.append((index, hr_index, row, claim_key, request_hash))
+
+    for index in hr_values:
+        if index not in used:
+            fail(index, "Heart rate Observation has no matching BP panel")
+
+    if key is not None:
+        # Keys derived from the header stand for the whole Bundle
+        request_hash = idempotency.batch_fingerprint([entry[4] for entry in created])
+        created = [(index, hr_index, row, claim_key, request_hash) for index, hr_index, row, claim_key, _ in created]
+
+    claims: Dict[str, Tuple[str, uuid.UUID]] = {}
+    for index, hr_index, row, claim_key, request_hash in created:
+        if claim_key is not None and claim_key in claims:
+            fail(index, "Another entry of this Bundle has the same identifier", hr_index)
+        elif claim_key is not None:
+            claims[claim_key] = (request_hash, row["id"])
+    taken = await idempotency.claim_many(session, user.id, claims)
+
+    rows = []
+    replayed = False
+    for index, hr_index, row, claim_key, request_hash in created:
+        if outcomes[index] is not None:
+            continue
+        status, row_id = "201 Created", row["id"]
+        if claim_key in taken:
+            if key is not None:
+                row_id = idempotency.replay(taken[claim_key], request_hash)
+            elif taken[claim_key].request_hash != request_hash:
+                fail(index, "IDEMPOTENCY_KEY_REUSED", hr_index)
+                continue
+            else:
+                row_id = taken[claim_key].measurement_id
+            status, replayed = "200 OK", True
+        else:
+            rows.append(row)
+        outcomes[index] = {"response": {"status": status, "location": f"Observation/{row_id}"}}
+        if hr_index is not None:
+            outcomes[hr_index] = {"response": {"status": status, "location": f"Observation/{row_id}-hr"}}
+
+    if replayed and not rows:
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+    if rows:
+        await session.execute(insert(Measurement), rows)
+        await etags.bump(session, user.id)
+        await live.publish_created(session, user.id, rows)
+        await session.commit()
+        response_cache.invalidate(user.id)
+        replica.note_write(user.id)
+        metrics.measurements_inserted.inc("fhir", amount=len(rows))
+    return {"resourceType": "Bundle", "type": f"{bundle_type}-response", "entry": outcomes}
+
+
 @fhir_router.post("/Observation")
 async def create_observation_fhir(
     payload: Dict[str, Any],
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None),
     user: User = Depends(current_active_verified_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    """Accepts a FHIR Observation or Bundle to create a BP measurement."""
+    """
+    Accepts a FHIR Observation or Bundle to create a BP measurement.
+    ``batch`` and ``transaction`` Bundles store every BP panel they contain.
+    A repeated ``Idempotency-Key``, or else BP panel ``identifier``, returns
+    the Observations created the first time (app.idempotency).
+    """
+    if payload.get("resourceType") == "Bundle" and payload.get("type") in ("batch", "transaction"):
+        return await _process_bundle(payload, user, session, idempotency.request_key(idempotency_key), response)
+
     resources: List[Dict[str, Any]]
     if payload.get("resourceType") == "Bundle":
         resources = [e.get("resource") for e in payload.get("entry", []) if isinstance(e, dict)]
@@ -205,6 +481,7 @@ async def create_observation_fhir(
         resources = [payload]
 
     bp_data = None
+    bp_resource: Dict[str, Any] = {}
     heart_rate: Optional[int] = None
     for res in resources:
         if not isinstance(res, dict):
@@ -214,6 +491,8 @@ async def create_observation_fhir(
                 bp_data = _parse_bp_observation(res)
             except HTTPException:
                 raise
+            if bp_data is not None:
+                bp_resource = res
         if heart_rate is None:
             try:
                 heart_rate = _extract_hr_from(res)
@@ -225,28 +504,127 @@ async def create_observation_fhir(
     if heart_rate is None:
         raise HTTPException(status_code=400, detail="Heart rate (LOINC 8867-4) is required")
 
-    db_obj = Measurement(
-        user_id=user.id,
-        systolic=bp_data["systolic"],
-        diastolic=bp_data["diastolic"],
-        pulse=heart_rate,
-        timestamp=bp_data["timestamp"],
-        tags=[],
-        notes=bp_data.get("notes"),
-    )
+    row_id = uuid.uuid4()
+    row = {
+        "id": row_id,
+        "user_id": user.id,
+        "systolic": bp_data["systolic"],
+        "diastolic": bp_data["diastolic"],
+        "pulse": heart_rate,
+        "timestamp": bp_data["timestamp"],
+        "tags": [],
+        "notes": bp_data.get("notes"),
+    }
+    key = idempotency.request_key(idempotency_key) or idempotency.fhir_identifier_key(bp_resource)
+    if key is not None:
+        request_hash = idempotency.measurement_fingerprint(row, _parse_effective(bp_resource))
+        original = await idempotency.claim(session, user.id, key, request_hash, row_id)
+        if original is not None:
+            db_obj = await session.scalar(
+                select(Measurement).where(Measurement.id == original, Measurement.user_id == user.id)
+            )
+            if db_obj is None:
+                raise HTTPException(status_code=404, detail="MEASUREMENT_NOT_FOUND")
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+            return _created_bundle(db_obj, user.id)
+
+    db_obj = Measurement(**row)
     session.add(db_obj)
+    await etags.bump(session, user.id)
+    await live.publish_created(session, user.id, [row])
     await session.commit()
-    # Return the created Observations as a Bundle
+    response_cache.invalidate(user.id)
+    replica.note_write(user.id)
+    metrics.measurements_inserted.inc("fhir")
+    return _created_bundle(db_obj, user.id)
+
+
+def _created_bundle(meas: Measurement, user_id: uuid.UUID) -> Dict[str, Any]:
+    """The created Observations as a Bundle"""
     return {
         "resourceType": "Bundle",
         "type": "collection",
         "entry": [
-            {"resource": _observation_bp(db_obj, user.id)},
-            {"resource": _observation_hr(db_obj, user.id)},
+            {"resource": _observation_bp(meas, user_id)},
+            {"resource": _observation_hr(meas, user_id)},
         ],
     }
 
 
+@fhir_router.get("/$export", status_code=202)
+async def bulk_export_kickoff(
+    request: Request,
+    response: Response,
+    prefer: Optional[str] = Header(default=None),
+    output_format: Optional[str] = Query(default=None, alias="_outputFormat"),
+    types: Optional[str] = Query(default=None, alias="_type"),
+    user: User = Depends(current_superuser),
+    session: AsyncSession = Depends(get_export_read_session),
+):
+    """
+    FHIR Bulk Data kick-off. Queues an NDJSON export of all Observations and
+    answers 202 with Content-Location pointing at the status endpoint.
+    """
+    if not prefer or "respond-async" not in prefer:
+        raise HTTPException(status_code=400, detail="Prefer: respond-async header is required")
+    if output_format and output_format not in ("application/fhir+ndjson", "application/ndjson", "ndjson"):
+        raise HTTPException(status_code=400, detail="Unsupported _outputFormat")
+    if types and "Observation" not in [t.strip() for t in types.split(",")]:
+        raise HTTPException(status_code=400, detail="Only Observation can be exported")
+
+    # Bulk export is imported on first use; most processes never serve it
+    from app import bulk_export
+
+    job_id = bulk_export.start_export(session.bind.url, str(request.url), _observation_bp, _observation_hr)
+    response.headers["Content-Location"] = str(request.url_for("bulk_export_status", job_id=job_id))
+    return None
+
+
+@fhir_router.get("/$export-status/{job_id}", name="bulk_export_status")
+async def bulk_export_status(
+    job_id: str,
+    request: Request,
+    response: Response,
+    user: User = Depends(current_superuser),
+):
+    from app import bulk_export
+
+    status = bulk_export.job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="EXPORT_NOT_FOUND")
+    if status["state"] == "running":
+        response.status_code = 202
+        rows = status["rows"]
+        response.headers["X-Progress"] = f"{rows} measurements written" if rows is not None else "in progress"
+        response.headers["Retry-After"] = "5"
+        return None
+    if status["state"] == "error":
+        raise HTTPException(status_code=500, detail=f"Export failed: {status['message']}")
+    manifest = status["manifest"]
+    for item in manifest["output"]:
+        item["url"] = str(request.url_for("bulk_export_file", job_id=job_id, file_name=item["url"]))
+    return manifest
+
+
+@fhir_router.delete("/$export-status/{job_id}", status_code=202)
+async def bulk_export_delete(job_id: str, user: User = Depends(current_superuser)):
+    from app import bulk_export
+
+    if not bulk_export.delete_job(job_id):
+        raise HTTPException(status_code=404, detail="EXPORT_NOT_FOUND")
+    return None
+
+
+@fhir_router.get("/$export-files/{job_id}/{file_name}", name="bulk_export_file")
+async def bulk_export_file(job_id: str, file_name: str, user: User = Depends(current_superuser)):
+    from app import bulk_export
+
+    path = bulk_export.job_dir(job_id)
+    if path is None or file_name != bulk_export.OUTPUT or not (path / bulk_export.MANIFEST).exists():
+        raise HTTPException(status_code=404, detail="EXPORT_FILE_NOT_FOUND")
+    return FileResponse(path / file_name, media_type="application/fhir+ndjson")
+
+
 @fhir_router.get("/Patient/me")
 async def get_patient_me(user: User = Depends(current_active_verified_user)):
     return {
@@ -1,72 +1,378 @@
+import calendar
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import etags, idempotency, live, metrics, replica, write_coalescer
 from app.db import Measurement, User, get_async_session
-from app.schemas import BpMeasurement
+from app.downsample import MAX_SERIES_POINTS, lttb
+from app.measurement_encoder import LIST_COLUMNS, MeasurementListEncoder
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, measurement_page_query, split_page
+from app.response_cache import response_cache
+from app.schemas import BpBulkDelete, BpMeasurement
+from app.stats import bucket_row, bucket_stats_query, parse_tz
+from app.tags import MAX_FILTER_TAGS, parse_tags, tag_condition, tag_facet_query, tags_condition
 from app.users import fastapi_users
 
 measurement_router = APIRouter()
 
 current_active_verified_user = fastapi_users.current_user(active=True, verified=True)
+# Read-only routes: replica when configured, primary right after the user's own writes
+get_read_session = replica.read_session_dependency(current_active_verified_user)
+
+# Upper bound for POST /bp/batch; larger imports should be split client-side
+MAX_BATCH_SIZE = 10000
 
 
 @measurement_router.post("/bp")
 async def create_bp(
     measurement: BpMeasurement,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None),
     user: User = Depends(current_active_verified_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
-    Saves a blood pressure measurement
+    Saves a blood pressure measurement. With WRITE_COALESCING_ENABLED the row
+    is committed by the shared writer together with other requests' rows
+    (app.write_coalescer); the response still waits for that commit.
+    A retry with the same ``Idempotency-Key`` returns the first request's id
+    and stores nothing (app.idempotency).
     :param token:
     :param user:
     :param measurement:
     :return:
     """
-    db_obj = Measurement(
-        user_id=user.id,
-        systolic=measurement.systolic,
-        diastolic=measurement.diastolic,
-        pulse=measurement.pulse,
-        timestamp=measurement.timestamp,
-        tags=measurement.tags or [],
-        notes=measurement.notes,
-    )
-    session.add(db_obj)
+    key = idempotency.request_key(idempotency_key)
+    row_id = uuid.uuid4()
+    row = {
+        "id": row_id,
+        "user_id": user.id,
+        "systolic": measurement.systolic,
+        "diastolic": measurement.diastolic,
+        "pulse": measurement.pulse,
+        "timestamp": measurement.timestamp,
+        "tags": measurement.tags or [],
+        "notes": measurement.notes,
+    }
+    if key is not None:
+        request_hash = idempotency.measurement_fingerprint(row, measurement.timestamp)
+        original = await idempotency.claim(session, user.id, key, request_hash, row_id)
+        if original is not None:
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+            return {"ok": True, "id": str(original)}
+
+    writer = write_coalescer.writer
+    # A claimed key has to commit together with its row, so keyed requests write directly
+    if writer is not None and key is None:
+        await writer.submit(row)
+        metrics.measurements_inserted.inc("api")
+        return {"ok": True, "id": str(row_id)}
+
+    session.add(Measurement(**row))
+    await etags.bump(session, user.id)
+    await live.publish_created(session, user.id, [row])
     await session.commit()
-    return {"ok": True, "id": str(db_obj.id)}
+    response_cache.invalidate(user.id)
+    replica.note_write(user.id)
+    metrics.measurements_inserted.inc("api")
+    return {"ok": True, "id": str(row_id)}
+
+
+@measurement_router.post("/bp/batch")
+async def create_bp_batch(
+    response: Response,
+    items: List[Any] = Body(..., description="List of BpMeasurement objects"),
+    idempotency_key: Optional[str] = Header(default=None),
+    user: User = Depends(current_active_verified_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Saves many blood pressure measurements in one transaction.
+    Items are validated individually; invalid ones are reported in ``errors``
+    and the valid ones are still stored with a single multi-row INSERT.
+    A retry with the same ``Idempotency-Key`` returns the ids stored the first
+    time and inserts nothing again.
+    :param items:
+    :param user:
+    :return: ``ids`` aligned with the input (null for rejected items) and ``errors``
+    """
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail="BATCH_TOO_LARGE")
+
+    key = idempotency.request_key(idempotency_key)
+    rows = []
+    indexes = []
+    ids: List[Optional[str]] = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            measurement = BpMeasurement.model_validate(item)
+        except ValidationError as e:
+            ids.append(None)
+            errors.append({"index": index, "detail": e.errors(include_url=False, include_context=False)})
+            continue
+        row_id = uuid.uuid4()
+        rows.append(
+            {
+                "id": row_id,
+                "user_id": user.id,
+                "systolic": measurement.systolic,
+                "diastolic": measurement.diastolic,
+                "pulse": measurement.pulse,
+                "timestamp": measurement.timestamp,
+                "tags": measurement.tags or [],
+                "notes": measurement.notes,
+            }
+        )
+        indexes.append(index)
+        ids.append(str(row_id))
+
+    if key is not None and rows:
+        request_hash = idempotency.batch_fingerprint(
+            [idempotency.measurement_fingerprint(row, row["timestamp"]) for row in rows]
+        )
+        keyed = {idempotency.item_key(key, index): (index, row) for index, row in zip(indexes, rows)}
+        taken = await idempotency.claim_many(
+            session, user.id, {k: (request_hash, row["id"]) for k, (_, row) in keyed.items()}
+        )
+        for k, claimed in taken.items():
+            ids[keyed[k][0]] = str(idempotency.replay(claimed, request_hash))
+        if taken:
+            rows = [row for k, (_, row) in keyed.items() if k not in taken]
+            if not rows:
+                response.headers[idempotency.REPLAYED_HEADER] = "true"
+
+    if rows:
+        # executemany of a Core insert: batched multi-row VALUES, no per-row RETURNING
+        await session.execute(insert(Measurement), rows)
+        await etags.bump(session, user.id)
+        await live.publish_created(session, user.id, rows)
+        await session.commit()
+        response_cache.invalidate(user.id)
+        replica.note_write(user.id)
+        metrics.measurements_inserted.inc("batch", amount=len(rows))
+    return {"ok": not errors, "inserted": len(rows), "ids": ids, "errors": errors}
 
 
 @measurement_router.get("/bp")
 async def list_bp(
+    request: Request,
+    from_ts: Optional[datetime] = Query(default=None, alias="from", description="Inclusive lower bound"),
+    to_ts: Optional[datetime] = Query(default=None, alias="to", description="Exclusive upper bound"),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from X-Next-Cursor"),
+    unpaged: bool = Query(default=False, alias="all", description="Return the whole history in one response"),
+    tags: Optional[List[str]] = Query(
+        default=None, description="Only measurements with these tags (repeated or comma-separated)"
+    ),
+    tags_match: Literal["any", "all"] = Query(default="any", description="Require any or all of ``tags``"),
     user: User = Depends(current_active_verified_user),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
-    Retrieves blood pressure measurements
-    :param token:
+    Retrieves blood pressure measurements, newest first, in pages of ``limit``
+    (DEFAULT_PAGE_SIZE when not given) rows; the next page's cursor is returned
+    in the X-Next-Cursor and Link headers.
+    ``all=true`` returns the whole (optionally time- and tag-filtered) history instead.
+    Answers 304 without querying the list when If-None-Match has the current ETag,
+    and serves the encoded body from the response cache when enabled.
+    :param from_ts:
+    :param to_ts:
+    :param limit:
+    :param cursor:
+    :param unpaged:
+    :param tags:
+    :param tags_match:
     :param user:
     :return:
     """
-    result = await session.execute(
-        select(Measurement).where(Measurement.user_id == user.id).order_by(Measurement.timestamp.desc())
+    tag_list = parse_tags(tags)
+    if len(tag_list) > MAX_FILTER_TAGS:
+        raise HTTPException(status_code=400, detail="TOO_MANY_TAGS")
+    if unpaged and (limit is not None or cursor is not None):
+        raise HTTPException(status_code=400, detail="ALL_WITH_PAGING")
+    if not unpaged and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    etag = await etags.current_etag(session, user.id)
+    cached = etags.not_modified(request, etag)
+    if cached is not None:
+        return cached
+    cache_key = response_cache.key(request, user.id, etag) if response_cache.enabled else None
+    if cache_key is not None:
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            return Response(entry[0], media_type="application/json", headers=entry[1])
+    headers = {"ETag": etag, "Cache-Control": etags.CACHE_CONTROL}
+    # Plain column rows, encoded without ORM objects or item dicts (app.measurement_encoder)
+    stmt = measurement_page_query(select(*LIST_COLUMNS), user.id, from_ts, to_ts, cursor, limit)
+    if tag_list:
+        stmt = stmt.where(tags_condition(session.bind.dialect.name, tag_list, tags_match))
+    result = await session.execute(stmt)
+    rows, next_cursor = split_page(result.all(), limit)
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    body = MeasurementListEncoder(user.id).array(rows)
+    if cache_key is not None:
+        response_cache.set(cache_key, body, headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@measurement_router.get("/bp/tags")
+async def bp_tag_facets(
+    from_ts: Optional[datetime] = Query(default=None, alias="from", description="Inclusive lower bound"),
+    to_ts: Optional[datetime] = Query(default=None, alias="to", description="Exclusive upper bound"),
+    user: User = Depends(current_active_verified_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Tag counts over the user's measurements, most used first, computed with a
+    GROUP BY over the unnested tags in the database.
+    :param from_ts:
+    :param to_ts:
+    :param user:
+    :return:
+    """
+    stmt = tag_facet_query(session.bind.dialect.name, user.id, from_ts, to_ts)
+    result = await session.execute(stmt)
+    return {"tags": [{"tag": tag, "count": count} for tag, count in result]}
+
+
+@measurement_router.get("/bp/series")
+async def bp_series(
+    points: int = Query(default=500, ge=3, le=MAX_SERIES_POINTS, description="Points per series"),
+    from_ts: Optional[datetime] = Query(default=None, alias="from", description="Inclusive lower bound"),
+    to_ts: Optional[datetime] = Query(default=None, alias="to", description="Exclusive upper bound"),
+    user: User = Depends(current_active_verified_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Chart series of systolic, diastolic and pulse, oldest first, each downsampled
+    to at most ``points`` [epoch_ms, value] pairs with LTTB. The downsampling is
+    CPU-bound and runs in the threadpool, off the event loop.
+    :param points:
+    :param from_ts:
+    :param to_ts:
+    :param user:
+    :return: ``total`` rows in range plus one list per metric
+    """
+    cols = select(Measurement.timestamp, Measurement.systolic, Measurement.diastolic, Measurement.pulse)
+    result = await session.execute(measurement_page_query(cols, user.id, from_ts, to_ts))
+    return await run_in_threadpool(_series_body, result.all(), points)
+
+
+def _series_body(rows: List[Any], points: int) -> Dict[str, Any]:
+    # Plain tuples straight off the index scan, newest first; transpose into oldest-first columns
+    rows.reverse()
+    timestamps, *values = zip(*rows) if rows else ((), (), (), ())
+    # timegm reads naive values (SQLite) as UTC as well
+    xs = [calendar.timegm(ts.utctimetuple()) * 1000 + ts.microsecond // 1000 for ts in timestamps]
+    body: Dict[str, Any] = {"total": len(rows)}
+    for name, ys in zip(("systolic", "diastolic", "pulse"), values):
+        body[name] = [[xs[i], ys[i]] for i in lttb(xs, ys, points)]
+    return body
+
+
+@measurement_router.get("/bp/stats")
+async def bp_stats(
+    bucket: Literal["day", "week", "month"] = Query(default="day", description="Bucket width"),
+    tz: str = Query(default="UTC", description="IANA time zone the buckets follow"),
+    from_ts: Optional[datetime] = Query(default=None, alias="from", description="Inclusive lower bound"),
+    to_ts: Optional[datetime] = Query(default=None, alias="to", description="Exclusive upper bound"),
+    user: User = Depends(current_active_verified_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Per-day/week/month statistics computed in the database, oldest bucket first.
+    Each bucket has count and mean/min/max of systolic, diastolic and pulse,
+    plus morning (before 12:00 local time) and evening means.
+    :param bucket:
+    :param tz:
+    :param from_ts:
+    :param to_ts:
+    :param user:
+    :return:
+    """
+    zone = parse_tz(tz)
+    stmt = bucket_stats_query(session.bind.dialect.name, user.id, bucket, zone, from_ts, to_ts)
+    result = await session.execute(stmt)
+    return {"bucket": bucket, "tz": zone.key, "buckets": [bucket_row(row) for row in result]}
+
+
+@measurement_router.get("/bp/events")
+async def bp_events(
+    user: User = Depends(current_active_verified_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Server-Sent Events stream of the user's measurement changes (app.live):
+    ``ready`` with the current list ETag, then ``created`` (items as listed by
+    GET /bp), ``deleted`` (ids) and ``resync`` (refetch the list) events.
+    """
+    subscription = live.broker.subscribe(user.id)
+    if subscription is None:
+        raise HTTPException(status_code=429, detail="TOO_MANY_SUBSCRIPTIONS")
+    # Subscribed first, so a write after this ETag is seen either here or as an event
+    try:
+        etag = await etags.current_etag(session, user.id)
+    except BaseException:
+        live.broker.unsubscribe(subscription)
+        raise
+    # The stream can stay open for hours; don't keep a pooled connection for it
+    await session.close()
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(
+        live.event_stream(subscription, {"etag": etag}), media_type="text/event-stream", headers=headers
     )
-    measurements = result.scalars().all()
-    return [
-        {
-            "id": str(m.id),
-            "userId": str(m.user_id),
-            "systolic": m.systolic,
-            "diastolic": m.diastolic,
-            "pulse": m.pulse,
-            "timestamp": m.timestamp.isoformat(),
-            "tags": m.tags or [],
-            "notes": m.notes,
-        }
-        for m in measurements
-    ]
+
+
+@measurement_router.post("/bp/delete")
+async def delete_bp_bulk(
+    selection: BpBulkDelete,
+    user: User = Depends(current_active_verified_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Deletes the user's measurements matching ``ids`` and/or the ``from``/``to``
+    range, optionally narrowed to those carrying ``tag``, in one DELETE statement.
+    Either ``ids`` or at least one range bound is required.
+    :param selection:
+    :param user:
+    :return: ``deleted`` count and the deleted ``ids``
+    """
+    if selection.ids is None and selection.from_ts is None and selection.to_ts is None:
+        raise HTTPException(status_code=400, detail="DELETE_SELECTION_REQUIRED")
+    if selection.ids is not None and len(selection.ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail="BATCH_TOO_LARGE")
+
+    stmt = delete(Measurement).where(Measurement.user_id == user.id)
+    if selection.ids is not None:
+        stmt = stmt.where(Measurement.id.in_(selection.ids))
+    if selection.from_ts is not None:
+        stmt = stmt.where(Measurement.timestamp >= selection.from_ts)
+    if selection.to_ts is not None:
+        stmt = stmt.where(Measurement.timestamp < selection.to_ts)
+    if selection.tag is not None:
+        stmt = stmt.where(tag_condition(session.bind.dialect.name, selection.tag))
+    stmt = stmt.returning(Measurement.id).execution_options(synchronize_session=False)
+
+    deleted = (await session.execute(stmt)).scalars().all()
+    if deleted:
+        await etags.bump(session, user.id)
+        await live.publish_deleted(session, user.id, deleted)
+        await session.commit()
+        response_cache.invalidate(user.id)
+        replica.note_write(user.id)
+    return {"ok": True, "deleted": len(deleted), "ids": [str(i) for i in deleted]}
 
 
 @measurement_router.delete("/bp/{measurement_id}")
@@ -75,12 +381,18 @@ async def delete_bp(
     user: User = Depends(current_active_verified_user),
     session: AsyncSession = Depends(get_async_session),
 ):
+    # One round trip: the user_id condition doubles as the ownership check
     result = await session.execute(
-        select(Measurement).where(Measurement.id == measurement_id, Measurement.user_id == user.id)
+        delete(Measurement)
+        .where(Measurement.id == measurement_id, Measurement.user_id == user.id)
+        .returning(Measurement.id)
+        .execution_options(synchronize_session=False)
     )
-    m = result.scalar_one_or_none()
-    if not m:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="MEASUREMENT_NOT_FOUND")
-    await session.delete(m)
+    await etags.bump(session, user.id)
+    await live.publish_deleted(session, user.id, [measurement_id])
     await session.commit()
+    response_cache.invalidate(user.id)
+    replica.note_write(user.id)
     return {"ok": True, "id": str(measurement_id)}
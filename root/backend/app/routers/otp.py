@@ -8,6 +8,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import User, get_async_session
 from app.schemas import EmailOtp
+from app.user_cache import user_cache
 
 otp_router = APIRouter()
 
@@ -27,6 +28,7 @@ async def _verify_core(user: User, otp_value: str, session: AsyncSession) -> boo
         user.otp_expiration = None
         user.is_verified = True
         await session.commit()
+        user_cache.invalidate(user.id)
         return True
     if (not user.otp) or (not user.otp_expiration) or user.otp != otp_value or user.otp_expiration < now:
         return False
@@ -34,6 +36,7 @@ async def _verify_core(user: User, otp_value: str, session: AsyncSession) -> boo
     user.otp_expiration = None
     user.is_verified = True
     await session.commit()
+    user_cache.invalidate(user.id)
     return True
 
 
@@ -1,6 +1,6 @@
 import uuid
 from fastapi_users import schemas
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 
 
@@ -28,3 +28,13 @@ class BpMeasurement(BaseModel):
     timestamp: datetime
     tags: list[str] | None = None
     notes: str | None = None
+
+
+class BpBulkDelete(BaseModel):
+    """Selection for POST /measurements/bp/delete; the given criteria are combined with AND."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    ids: list[uuid.UUID] | None = None
+    from_ts: datetime | None = Field(default=None, alias="from")
+    to_ts: datetime | None = Field(default=None, alias="to")
+    tag: str | None = None
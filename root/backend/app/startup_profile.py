@@ -0,0 +1,65 @@
+"""
+Import-time report for cold starts. Imports ``app.app`` in a fresh interpreter
+with ``-X importtime`` and prints the time attributed to each top-level package
+(self time of all its modules) and the cumulative time of each app module.
+
+    python -m app.startup_profile [--top 25] [--module app.app]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) per line of ``-X importtime`` output."""
+    rows = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return rows
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    totals: Dict[str, int] = defaultdict(int)
+    for module, self_us, _ in rows:
+        totals[module.split(".")[0]] += self_us
+    return dict(totals)
+
+
+def profile(module: str = "app.app") -> List[Tuple[str, int, int]]:
+    env = {**os.environ}
+    env.setdefault("SECRET_KEY", "startup-profile")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.app")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args(argv)
+
+    rows = profile(args.module)
+    total = sum(self_us for _, self_us, _ in rows)
+    print(f"import {args.module}: {total / 1000:.1f} ms, {len(rows)} modules\n")
+    print("package                          self ms")
+    for package, us in sorted(by_package(rows).items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"{package:<30} {us / 1000:>9.1f}")
+    print("\napp module                 cumulative ms")
+    for module, _, cumulative in sorted(rows, key=lambda r: -r[2]):
+        if module == "app" or module.startswith("app."):
+            print(f"{module:<30} {cumulative / 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,110 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import HTTPException
+from sqlalchemy import Date, Integer, Select, case, cast, extract, func, literal_column, select, type_coerce
+
+from app.db import Measurement
+
+# Bucket widths accepted by GET /measurements/bp/stats
+BUCKET_UNITS = ("day", "week", "month")
+# Local hour (0-23) from which a reading counts as an evening reading
+EVENING_FROM_HOUR = 12
+
+_METRICS = ("systolic", "diastolic", "pulse")
+
+
+def parse_tz(name: str) -> ZoneInfo:
+    """Resolve an IANA time zone name. Raises 400 INVALID_TIMEZONE on unknown names."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="INVALID_TIMEZONE")
+
+
+def _local_timestamp(dialect: str, tz: ZoneInfo):
+    if dialect == "postgresql":
+        return func.timezone(tz.key, Measurement.timestamp)
+    # SQLite (tests/dev) has no tz database: shift by the zone's current UTC offset
+    offset = datetime.now(timezone.utc).astimezone(tz).utcoffset()
+    return func.datetime(Measurement.timestamp, f"{int(offset.total_seconds() // 60):+d} minutes")
+
+
+def _bucket_start(dialect: str, local, unit: str):
+    if dialect == "postgresql":
+        # unit comes from BUCKET_UNITS; inlined so SELECT and GROUP BY render identically
+        return cast(func.date_trunc(literal_column(f"'{unit}'"), local), Date)
+    if unit == "day":
+        start = func.date(local)
+    elif unit == "week":
+        # ISO weeks start on Monday, like date_trunc('week')
+        start = func.date(local, "weekday 0", "-6 days")
+    else:
+        start = func.date(local, "start of month")
+    return type_coerce(start, Date)
+
+
+def _local_hour(dialect: str, local):
+    if dialect == "postgresql":
+        return cast(extract("hour", local), Integer)
+    return cast(func.strftime("%H", local), Integer)
+
+
+def bucket_stats_query(
+    dialect: str,
+    user_id: uuid.UUID,
+    unit: str,
+    tz: ZoneInfo,
+    from_ts: Optional[datetime] = None,
+    to_ts: Optional[datetime] = None,
+) -> Select:
+    """
+    One GROUP BY over the user's measurements: count, mean/min/max per metric
+    and morning/evening means per local-calendar bucket, oldest bucket first.
+
+    The local timestamp is computed once in a subquery so that on Postgres the
+    bucket expression in the outer SELECT and GROUP BY carries no bind parameters.
+    """
+    inner = select(
+        _local_timestamp(dialect, tz).label("local"),
+        Measurement.systolic,
+        Measurement.diastolic,
+        Measurement.pulse,
+    ).where(Measurement.user_id == user_id)
+    if from_ts is not None:
+        inner = inner.where(Measurement.timestamp >= from_ts)
+    if to_ts is not None:
+        inner = inner.where(Measurement.timestamp < to_ts)
+    sub = inner.subquery()
+
+    bucket = _bucket_start(dialect, sub.c.local, unit).label("start")
+    morning = _local_hour(dialect, sub.c.local) < EVENING_FROM_HOUR
+    columns = [bucket, func.count().label("count")]
+    for name in _METRICS:
+        col = sub.c[name]
+        columns += [
+            func.avg(col).label(f"{name}_mean"),
+            func.min(col).label(f"{name}_min"),
+            func.max(col).label(f"{name}_max"),
+        ]
+    for part, cond in (("morning", morning), ("evening", ~morning)):
+        columns.append(func.count(case((cond, 1))).label(f"{part}_count"))
+        columns += [func.avg(case((cond, sub.c[name]))).label(f"{part}_{name}") for name in _METRICS]
+    return select(*columns).group_by(bucket).order_by(bucket)
+
+
+def _mean(value) -> Optional[float]:
+    return round(float(value), 1) if value is not None else None
+
+
+def bucket_row(row) -> Dict[str, Any]:
+    """Shape one row of bucket_stats_query for the JSON response."""
+    m = row._mapping
+    item: Dict[str, Any] = {"start": m["start"].isoformat(), "count": m["count"]}
+    for name in _METRICS:
+        item[name] = {"mean": _mean(m[f"{name}_mean"]), "min": m[f"{name}_min"], "max": m[f"{name}_max"]}
+    for part in ("morning", "evening"):
+        item[part] = {"count": m[f"{part}_count"], **{name: _mean(m[f"{part}_{name}"]) for name in _METRICS}}
+    return item
@@ -0,0 +1,72 @@
+import uuid
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from sqlalchemy import ColumnElement, Select, and_, exists, func, or_, select, true, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db import Measurement
+
+# Tags accepted in one tags= filter
+MAX_FILTER_TAGS = 20
+
+
+def parse_tags(values: Optional[List[str]]) -> List[str]:
+    """Tags from repeated and/or comma-separated ``tags=`` parameters, deduplicated in order."""
+    tags: List[str] = []
+    for value in values or []:
+        for tag in value.split(","):
+            tag = tag.strip()
+            if tag and tag not in tags:
+                tags.append(tag)
+    return tags
+
+
+def _tags_json(dialect_name: str):
+    return type_coerce(Measurement.tags, JSONB) if dialect_name == "postgresql" else Measurement.tags
+
+
+def tag_condition(dialect_name: str, tag: str) -> ColumnElement[bool]:
+    """
+    ``tag`` is one of the measurement's tags. On Postgres a JSONB containment
+    (``tags @> '["home"]'``) that ix_measurements_tags (GIN) serves; json_each elsewhere (SQLite).
+    """
+    if dialect_name == "postgresql":
+        return _tags_json(dialect_name).contains([tag])
+    each = func.json_each(Measurement.tags).table_valued("value")
+    return exists(select(1).select_from(each).where(each.c.value == tag))
+
+
+def tags_condition(dialect_name: str, tags: List[str], match: Literal["any", "all"] = "any") -> ColumnElement[bool]:
+    """Measurements carrying any (OR) or all (AND) of ``tags``."""
+    if match == "all" and dialect_name == "postgresql":
+        # One containment of the whole list, still a single GIN lookup
+        return _tags_json(dialect_name).contains(tags)
+    conditions = [tag_condition(dialect_name, tag) for tag in tags]
+    return or_(*conditions) if match == "any" else and_(*conditions)
+
+
+def tag_facet_query(
+    dialect_name: str,
+    user_id: uuid.UUID,
+    from_ts: Optional[datetime] = None,
+    to_ts: Optional[datetime] = None,
+) -> Select:
+    """(tag, count) over the user's measurements, most used first; tags are unnested in the database."""
+    if dialect_name == "postgresql":
+        elements = func.jsonb_array_elements_text(_tags_json(dialect_name)).table_valued("value")
+    else:
+        elements = func.json_each(Measurement.tags).table_valued("value")
+    tag = elements.c.value.label("tag")
+    count = func.count().label("count")
+    stmt = (
+        select(tag, count)
+        .select_from(Measurement)
+        .join(elements, true())
+        .where(Measurement.user_id == user_id)
+    )
+    if from_ts is not None:
+        stmt = stmt.where(Measurement.timestamp >= from_ts)
+    if to_ts is not None:
+        stmt = stmt.where(Measurement.timestamp < to_ts)
+    return stmt.group_by(elements.c.value).order_by(count.desc(), elements.c.value)
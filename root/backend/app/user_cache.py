@@ -0,0 +1,70 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import metrics
+from app.db import User
+
+# Seconds a cached user stays valid; 0 disables the cache
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+# Users kept in memory; least recently used ones are evicted first
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+
+class UserCache:
+    """
+    In-process TTL/LRU cache of user rows keyed by id, so authenticating a
+    request doesn't need a SELECT. Holds column snapshots and hands out a fresh
+    detached User per lookup, so concurrent requests never share an instance
+    and one that gets added to a session is written back as an UPDATE.
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[uuid.UUID, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, user_id: uuid.UUID) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            metrics.user_cache_requests.inc("miss")
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        metrics.user_cache_requests.inc("hit")
+        user = User(**entry[1])
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User) -> None:
+        if self.ttl <= 0:
+            return
+        values = {key: getattr(user, key) for key in _COLUMNS}
+        self._entries[user.id] = (time.monotonic() + self.ttl, values)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_SIZE)
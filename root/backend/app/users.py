@@ -2,12 +2,13 @@ import os
 import secrets
 import uuid
 from datetime import timedelta, datetime, timezone
-from typing import Optional, Union
+from functools import lru_cache
+from typing import Any, Dict, Optional, Union
 
-import requests
 import logging
 from fastapi import Depends, Request, HTTPException
-from fastapi_users import BaseUserManager, FastAPIUsers, models, InvalidPasswordException
+from fastapi.security import OAuth2PasswordRequestForm
+from fastapi_users import BaseUserManager, FastAPIUsers, exceptions, models, InvalidPasswordException
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
@@ -15,24 +16,42 @@ from fastapi_users.authentication import (
 )
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from fastapi_users.manager import UUIDIDMixin
-from httpx_oauth.clients.google import GoogleOAuth2
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import email_outbox, metrics, passwords
 from app.db import User, get_user_db
 from app.schemas import UserCreate
+from app.user_cache import user_cache
 
 SECRET = os.getenv("SECRET_KEY")
 if not SECRET or not isinstance(SECRET, str) or not SECRET.strip():
     raise RuntimeError(
         "SECRET_KEY is missing. Set it in your environment or .env (e.g., SECRET_KEY=your-long-random-string)."
     )
-RESEND_API_KEY = os.getenv("RESEND_API_KEY")
 
-# Default scopes "userinfo.profile","userinfo.email"
-google_oauth_client = GoogleOAuth2(
-    os.getenv("GOOGLE_CLIENT_ID", ""),
-    os.getenv("GOOGLE_CLIENT_SECRET", ""),
-)
-SEND_FROM = os.getenv("SEND_FROM")
+# /auth/google is only mounted when a client id is configured
+GOOGLE_OAUTH_ENABLED = bool(os.getenv("GOOGLE_CLIENT_ID", "").strip())
+
+
+@lru_cache(maxsize=None)
+def get_google_oauth_client():
+    """Google OAuth2 client, imported on demand so deployments without Google login don't load it."""
+    from httpx_oauth.clients.google import GoogleOAuth2
+
+    # Default scopes "userinfo.profile","userinfo.email"
+    return GoogleOAuth2(
+        os.getenv("GOOGLE_CLIENT_ID", ""),
+        os.getenv("GOOGLE_CLIENT_SECRET", ""),
+    )
+
+
+def __getattr__(name: str):
+    # ``google_oauth_client`` used to be a module-level client; keep it importable, created on first access
+    if name == "google_oauth_client":
+        return get_google_oauth_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 logger = logging.getLogger("app.otp")
 
 # Optional testing override: set TEST_FIXED_OTP to force a specific OTP
@@ -49,29 +68,15 @@ def generate_otp() -> str:
     return ''.join(secrets.choice('0123456789') for _ in range(4))
 
 
-def send_email_with_resend(to_email: str, otp: str):
+def queue_otp_email(session: AsyncSession, to_email: str, otp: str) -> None:
     """
-    Sends an email using Resend HTTP API
+    Adds the OTP email to the outbox; it is stored with the caller's next commit
+    and delivered by the outbox worker (app.email_outbox).
+    :param session:
     :param to_email:
     :param otp:
     :return:
     """
-    # Check if email sending is disabled via env
-    send_emails = os.getenv("SEND_EMAILS", "true").strip().lower() not in ("0", "false", "no")
-    if not send_emails:
-        logger.info("SEND_EMAILS disabled; skipping email to=%s (OTP=%s)", to_email, otp)
-        return
-
-    if not RESEND_API_KEY:
-        raise HTTPException(status_code=500, detail="Email service not configured: RESEND_API_KEY missing")
-    if not SEND_FROM or not SEND_FROM.strip():
-        raise HTTPException(status_code=500, detail="Email service not configured: SEND_FROM missing")
-
-    url = "https://api.resend.com/emails"
-    headers = {
-        "Authorization": f"Bearer {RESEND_API_KEY}",
-        "Content-Type": "application/json",
-    }
     # Compose optional verification link
     verify_base = os.getenv("VERIFY_LINK_BASE") or os.getenv("PUBLIC_BACKEND_BASE_URL")
     target_redirect = os.getenv("VERIFY_SUCCESS_REDIRECT")
@@ -83,39 +88,65 @@ def send_email_with_resend(to_email: str, otp: str):
         if target_redirect and target_redirect.strip():
             verify_link += f"&redirect_to={quote(target_redirect.strip())}"
 
-    payload = {
-        "from": SEND_FROM,
-        "to": [to_email],
-        "subject": "Your OTP Code",
-        "html": (
-            f"<p>Your OTP code is: <strong>{otp}</strong></p>"
-            + (f"<p><a href=\"{verify_link}\">Click here to verify</a></p>" if verify_link else "")
-        ),
-    }
-    try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=15)
-        if resp.status_code not in (200, 201):
-            # Resend returns JSON with an error message
-            try:
-                detail = resp.json()
-            except Exception:
-                detail = {"message": resp.text}
-            raise HTTPException(status_code=500, detail=f"Email send failed: {detail}")
-        try:
-            rid = resp.json().get("id")
-        except Exception:
-            rid = None
-        logger.info("OTP email queued via Resend: to=%s id=%s", to_email, rid)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Email send exception: {e}")
+    html = (
+        f"<p>Your OTP code is: <strong>{otp}</strong></p>"
+        + (f"<p><a href=\"{verify_link}\">Click here to verify</a></p>" if verify_link else "")
+    )
+    email_outbox.enqueue(session, to_email, "Your OTP Code", html)
 
 
 class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     reset_password_token_secret = SECRET
     verification_token_secret = SECRET
 
+    async def get(self, id: uuid.UUID) -> User:
+        # Called by the JWT strategy on every authenticated request
+        user = user_cache.get(id)
+        if user is None:
+            user = await super().get(id)
+            user_cache.put(user)
+        return user
+
+    # create/authenticate/_update mirror BaseUserManager but hash off the event loop (app.passwords)
+
+    async def create(self, user_create: UserCreate, safe: bool = False, request: Optional[Request] = None) -> User:
+        await self.validate_password(user_create.password, user_create)
+        if await self.user_db.get_by_email(user_create.email) is not None:
+            raise exceptions.UserAlreadyExists()
+        user_dict = user_create.create_update_dict() if safe else user_create.create_update_dict_superuser()
+        password = user_dict.pop("password")
+        user_dict["hashed_password"] = await passwords.hash_password(self.password_helper, password)
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def authenticate(self, credentials: OAuth2PasswordRequestForm) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Run the hasher anyway to mitigate timing attacks
+            await passwords.hash_password(self.password_helper, credentials.password)
+            metrics.logins.inc("failure")
+            return None
+        verified, updated_password_hash = await passwords.verify_and_update(
+            self.password_helper, credentials.password, user.hashed_password
+        )
+        if not verified:
+            metrics.logins.inc("failure")
+            return None
+        metrics.logins.inc("success")
+        if updated_password_hash is not None:
+            await self.user_db.update(user, {"hashed_password": updated_password_hash})
+        return user
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        password = update_dict.get("password")
+        if password is not None:
+            await self.validate_password(password, user)
+            update_dict = {k: v for k, v in update_dict.items() if k != "password"}
+            update_dict["hashed_password"] = await passwords.hash_password(self.password_helper, password)
+        return await super()._update(user, update_dict)
+
     async def validate_password(
             self,
             password: str,
@@ -137,10 +168,11 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
             email = user.email
             otp = generate_otp()
             otp_expiration = datetime.now(timezone.utc) + timedelta(minutes=10)
-            send_email_with_resend(email, otp)
+            queue_otp_email(self.user_db.session, email, otp)
             user.otp = otp
             user.otp_expiration = otp_expiration
             await self.user_db.update(user, {"otp": otp, "otp_expiration": otp_expiration})
+            email_outbox.notify()
             logger.info("User registered: user_id=%s email=%s otp=%s", str(user.id), user.email, otp)
             print(f"OTP for {user.email} (register): {otp}", flush=True)
         except Exception:
@@ -160,11 +192,13 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
             email = user.email
             otp = generate_otp()
             otp_expiration = datetime.now(timezone.utc) + timedelta(minutes=10)
-            send_email_with_resend(email, otp)
-            # Save user OTP to the database
+            queue_otp_email(self.user_db.session, email, otp)
+            # Save user OTP to the database (commits the queued email too)
             user.otp = otp
             user.otp_expiration = otp_expiration
             await self.user_db.update(user, {"otp": otp, "otp_expiration": otp_expiration})
+            email_outbox.notify()
+            user_cache.invalidate(user.id)
 
             logger.info("Verification requested: user_id=%s email=%s otp=%s", str(user.id), user.email, otp)
             print(f"OTP for {user.email} (request-verify-token): {otp}", flush=True)
@@ -173,8 +207,21 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
             raise
 
     async def on_after_verify(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate(user.id)
         logger.info("User verified: user_id=%s email=%s", str(user.id), user.email)
 
+    async def on_after_update(
+        self, user: User, update_dict: Dict[str, Any], request: Optional[Request] = None
+    ) -> None:
+        # Covers deactivation and superuser/verified changes through the users router
+        user_cache.invalidate(user.id)
+
+    async def on_after_reset_password(self, user: User, request: Optional[Request] = None) -> None:
+        user_cache.invalidate(user.id)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None) -> None:
+        user_cache.invalidate(user.id)
+
 
 async def get_user_manager(user_db: SQLAlchemyUserDatabase = Depends(get_user_db)):
     yield UserManager(user_db)
@@ -0,0 +1,188 @@
+"""
+Coalesced ingestion for ``POST /measurements/bp`` (WRITE_COALESCING_ENABLED).
+
+Requests hand their row to a queue and wait. One writer task per process takes
+whatever has queued up, waiting at most WRITE_COALESCE_MAX_WAIT_MS after the
+first row or until WRITE_COALESCE_MAX_ROWS are in, and stores the batch with a
+single multi-row INSERT, one version bump and live event per user and one
+COMMIT. Each request
+is answered only after the commit that holds its row, so an acknowledged
+measurement is as durable as one written on its own.
+
+If the INSERT or COMMIT of a batch fails, its rows are retried one per
+transaction, so a bad row only fails its own request. Cache invalidation comes
+after the commit and never causes a retry: the rows are stored by then, and
+inserting them again would fail on their ids.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app import etags, live, metrics, replica
+from app.db import Measurement
+from app.response_cache import response_cache
+
+logger = logging.getLogger("app.write_coalescer")
+
+# Coalesce single-measurement writes into batched transactions
+WRITE_COALESCING_ENABLED = os.getenv("WRITE_COALESCING_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+# A batch is flushed once it has this many rows...
+WRITE_COALESCE_MAX_ROWS = int(os.getenv("WRITE_COALESCE_MAX_ROWS", "500"))
+# ...or this long after its first row arrived
+WRITE_COALESCE_MAX_WAIT_MS = float(os.getenv("WRITE_COALESCE_MAX_WAIT_MS", "5"))
+# Rows waiting for the writer; further requests wait for room (backpressure instead of unbounded memory)
+WRITE_COALESCE_MAX_QUEUE = int(os.getenv("WRITE_COALESCE_MAX_QUEUE", "10000"))
+
+Row = Dict[str, Any]
+# Row, the future of the waiting request and when it was queued
+Item = Tuple[Row, asyncio.Future, float]
+
+
+class MeasurementWriter:
+    def __init__(
+        self,
+        session_maker,
+        max_rows: int = WRITE_COALESCE_MAX_ROWS,
+        max_wait: float = WRITE_COALESCE_MAX_WAIT_MS / 1000,
+        max_queue: int = WRITE_COALESCE_MAX_QUEUE,
+    ):
+        self.session_maker = session_maker
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name="measurement-writer")
+
+    async def stop(self) -> None:
+        """Flush what is queued, then end the writer task. Later submits write directly."""
+        self._stopping = True
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+            # Requests that got hold of the writer just before shutdown can queue behind the stop marker,
+            # or were waiting for room in a full queue
+            while True:
+                rest = []
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        rest.append(item)
+                if not rest:
+                    break
+                await self._flush(rest)
+
+    async def submit(self, row: Row) -> None:
+        """Queue ``row`` (a complete ``measurements`` row) and return once it is committed."""
+        if self._stopping:
+            # Nothing takes rows off the queue any more
+            await self._write([row])
+            self._announce([row])
+            return
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future, time.perf_counter()))
+        await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch: List[Item] = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_rows:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                # Never leave a request waiting, whatever went wrong
+                logger.exception("Coalesced measurement write failed")
+                for _, future, _ in batch:
+                    _fail(future, e)
+
+    async def _flush(self, batch: List[Item]) -> None:
+        started = time.perf_counter()
+        for _, _, queued in batch:
+            metrics.coalesced_queue_wait.observe(started - queued)
+        rows = [row for row, _, _ in batch]
+        try:
+            await self._write(rows)
+        except Exception as e:
+            if len(batch) == 1:
+                _fail(batch[0][1], e)
+                return
+            logger.warning("Coalesced batch of %s rows failed, retrying rows one by one: %s", len(batch), e)
+            for row, future, _ in batch:
+                try:
+                    await self._write([row])
+                except Exception as row_error:
+                    _fail(future, row_error)
+                else:
+                    self._announce([row])
+                    _resolve(future)
+            return
+        metrics.coalesced_batch_rows.observe(len(batch))
+        metrics.coalesced_commit_latency.observe(time.perf_counter() - started)
+        self._announce(rows)
+        for _, future, _ in batch:
+            _resolve(future)
+
+    async def _write(self, rows: List[Row]) -> None:
+        async with self.session_maker() as session:
+            await session.execute(insert(Measurement), rows)
+            user_ids = {row["user_id"] for row in rows}
+            await etags.bump_many(session, user_ids)
+            for user_id in user_ids:
+                await live.publish_created(session, user_id, [row for row in rows if row["user_id"] == user_id])
+            await session.commit()
+
+    def _announce(self, rows: List[Row]) -> None:
+        """
+        Post-commit bookkeeping, here rather than in the route so it also happens
+        for requests whose client went away. Failures are only logged.
+        """
+        for user_id in {row["user_id"] for row in rows}:
+            try:
+                response_cache.invalidate(user_id)
+                replica.note_write(user_id)
+            except Exception:
+                logger.exception("Post-commit notifications for user %s failed", user_id)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    # A request whose client went away has a cancelled future; its row is stored anyway
+    if not future.done():
+        future.set_result(None)
+
+
+def _fail(future: asyncio.Future, error: Exception) -> None:
+    if not future.done():
+        future.set_exception(error)
+
+
+# Started by the app lifespan; None when coalescing is disabled
+writer: Optional[MeasurementWriter] = None
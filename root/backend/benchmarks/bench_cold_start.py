@@ -0,0 +1,90 @@
+"""
+Cold start to first served request: spawns ``uvicorn app.app:app`` and polls
+GET /ready until it answers 200, once per DB_SCHEMA_STARTUP mode. The database
+is migrated to head first, so ``check`` has a revision to verify. Also prints
+how long importing app.app takes on its own.
+
+By default the app uses a fresh SQLite file; set DATABASE_URL to measure
+against Postgres (it gets migrated with ``alembic upgrade head``).
+
+    python -m benchmarks.bench_cold_start [--runs 5] [--modes create,check,skip]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _migrate(env: dict) -> None:
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=BACKEND, env=env, check=True,
+                   capture_output=True)
+
+
+def cold_start(env: dict, timeout: float = 60.0) -> float:
+    """Seconds from spawning the server until GET /ready answers 200."""
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - t0 < timeout:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited: {proc.stderr.read().decode()[-2000:]}")
+                try:
+                    if client.get("/ready").status_code == 200:
+                        return time.perf_counter() - t0
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise TimeoutError("server did not become ready")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def import_seconds(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import app.app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env, check=True, capture_output=True)
+    return float(out.stdout.decode().strip().splitlines()[-1])
+
+
+def main(args) -> None:
+    env = {**os.environ}
+    env.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'cold.db')}")
+    env.setdefault("SECRET_KEY", "bench-secret")
+    env.setdefault("SEND_EMAILS", "false")
+    env.setdefault("EMAIL_OUTBOX_WORKER", "false")
+    env.pop("AUTO_CREATE_DB_SCHEMA", None)
+    _migrate(env)
+
+    imports = [import_seconds(env) for _ in range(args.runs)]
+    print(f"{'import':<8} median {statistics.median(imports) * 1000:7.0f} ms  min {min(imports) * 1000:7.0f} ms")
+    for mode in args.modes.split(","):
+        runs = [cold_start({**env, "DB_SCHEMA_STARTUP": mode}) for _ in range(args.runs)]
+        print(f"{mode:<8} median {statistics.median(runs) * 1000:7.0f} ms  min {min(runs) * 1000:7.0f} ms"
+              "  (spawn to first 200 on /ready)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default="create,check,skip")
+    main(parser.parse_args())
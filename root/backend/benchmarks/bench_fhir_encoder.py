@@ -0,0 +1,60 @@
+"""
+Microbenchmark: FHIR Observation entries per second, builder dicts + json.dumps
+versus the precompiled ObservationEncoder.
+
+    python -m benchmarks.bench_fhir_encoder [rows]
+"""
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from app.fhir_encoder import ObservationEncoder, dumps
+from app.routers.fhir import _observation_bp, _observation_hr
+
+
+def _make_rows(n: int):
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    return [
+        SimpleNamespace(id=uuid.uuid4(), timestamp=start + timedelta(hours=i),
+                        systolic=110 + i % 40, diastolic=70 + i % 20, pulse=55 + i % 30)
+        for i in range(n)
+    ]
+
+
+def _bench(label: str, fn, rows) -> float:
+    t0 = time.perf_counter()
+    for m in rows:
+        fn(m)
+    elapsed = time.perf_counter() - t0
+    rate = len(rows) / elapsed
+    print(f"{label:<10} {rate:>12,.0f} rows/s")
+    return rate
+
+
+def main(n: int = 100_000) -> None:
+    user_id = uuid.uuid4()
+    rows = _make_rows(n)
+    encoder = ObservationEncoder(user_id, _observation_bp, _observation_hr)
+
+    def generic(m):
+        return (
+            dumps({"fullUrl": f"urn:uuid:{m.id}", "resource": _observation_bp(m, user_id)})
+            + ","
+            + dumps({"fullUrl": f"urn:uuid:{m.id}-hr", "resource": _observation_hr(m, user_id)})
+        ).encode()
+
+    def compiled(m):
+        return encoder.entry_pair(m.id, m.timestamp, m.systolic, m.diastolic, m.pulse)
+
+    base = _bench("generic", generic, rows)
+    fast = _bench("compiled", compiled, rows)
+    print(f"speedup    {fast / base:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,108 @@
+"""
+POST /measurements/bp throughput, latency and COMMITs, writing each request in
+its own transaction and then through the coalescing writer (app.write_coalescer).
+Runs the app in-process on SQLite unless DATABASE_URL is set.
+
+    python -m benchmarks.bench_ingest [requests] [concurrency] [users]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+_db = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_db}")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("SEND_EMAILS", "false")
+os.environ.setdefault("TEST_FIXED_OTP", "1111")
+
+import httpx
+from sqlalchemy import event
+
+from app import write_coalescer
+from app.app import app
+from app.db import Base, async_session_maker, engine
+
+PASSWORD = "strongpass123"
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _user_headers(client: httpx.AsyncClient, index: int) -> dict:
+    email = f"ingest-{index:03d}@example.com"
+    (await client.post("/auth/register", json={"email": email, "password": PASSWORD})).raise_for_status()
+    (await client.post("/auth/verify-otp", json={"email": email, "otp": "1111"})).raise_for_status()
+    r = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def _run(client: httpx.AsyncClient, users: list, requests: int, concurrency: int, offset: int):
+    commits = 0
+
+    def on_commit(conn):
+        nonlocal commits
+        commits += 1
+
+    event.listen(engine.sync_engine, "commit", on_commit)
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    async def one(i: int):
+        nonlocal errors
+        body = {"systolic": 120, "diastolic": 80, "pulse": 60,
+                "timestamp": (start + timedelta(seconds=offset + i)).isoformat()}
+        async with gate:
+            t0 = time.perf_counter()
+            try:
+                r = await client.post("/measurements/bp", json=body, headers=users[i % len(users)])
+                r.raise_for_status()
+            except Exception:
+                # SQLite gives up with "database is locked" when many transactions queue for its write lock
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    finally:
+        event.remove(engine.sync_engine, "commit", on_commit)
+    return time.perf_counter() - t0, commits, errors, latencies
+
+
+async def main(requests: int = 2000, concurrency: int = 20, user_count: int = 10) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        users = [await _user_headers(client, i) for i in range(user_count)]
+        print(f"{requests} requests, {concurrency} in flight, {user_count} users")
+        for mode in ("direct", "coalesced"):
+            if mode == "coalesced":
+                write_coalescer.writer = write_coalescer.MeasurementWriter(async_session_maker)
+                write_coalescer.writer.start()
+            try:
+                offset = 0 if mode == "direct" else requests
+                elapsed, commits, errors, latencies = await _run(client, users, requests, concurrency, offset)
+            finally:
+                if write_coalescer.writer is not None:
+                    writer, write_coalescer.writer = write_coalescer.writer, None
+                    await writer.stop()
+            print(f"{mode:<10} {requests / elapsed:>8.0f} req/s  {commits / elapsed:>8.0f} commits/s ({commits} total)"
+                  f"  p50 {_percentile(latencies, 0.5):>6.1f} ms  p99 {_percentile(latencies, 0.99):>6.1f} ms"
+                  f"  errors {errors}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    asyncio.run(main(*args))
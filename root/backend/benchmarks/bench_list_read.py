@@ -0,0 +1,103 @@
+"""
+Full-history reads of one user: ORM entities copied into dicts and rendered by
+JSONResponse (the former list_bp path) versus Core column rows encoded by
+MeasurementListEncoder, and the same two for FHIR searchset entries. Reports
+rows/second and the peak Python memory (tracemalloc) of each.
+
+Seeds a fresh SQLite file unless DATABASE_URL is set and --no-seed is given.
+
+    python -m benchmarks.bench_list_read [--measurements 100000] [--runs 3] [--no-seed]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+_db = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_db}")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select
+
+from app.db import Measurement, async_session_maker, engine
+from app.fhir_encoder import ObservationEncoder
+from app.measurement_encoder import LIST_COLUMNS, SEARCHSET_COLUMNS, MeasurementListEncoder
+from app.pagination import measurement_page_query
+from app.routers.fhir import _observation_bp, _observation_hr
+from benchmarks import synthetic
+
+
+async def list_orm(session, user_id) -> int:
+    result = await session.execute(measurement_page_query(select(Measurement), user_id))
+    items = [
+        {
+            "id": str(m.id),
+            "userId": str(m.user_id),
+            "systolic": m.systolic,
+            "diastolic": m.diastolic,
+            "pulse": m.pulse,
+            "timestamp": m.timestamp.isoformat(),
+            "tags": m.tags or [],
+            "notes": m.notes,
+        }
+        for m in result.scalars().all()
+    ]
+    return len(JSONResponse(items).body)
+
+
+async def list_core(session, user_id) -> int:
+    result = await session.execute(measurement_page_query(select(*LIST_COLUMNS), user_id))
+    return len(MeasurementListEncoder(user_id).array(result.all()))
+
+
+async def fhir_orm(session, user_id) -> int:
+    encoder = ObservationEncoder(user_id, _observation_bp, _observation_hr)
+    result = await session.execute(measurement_page_query(select(Measurement), user_id))
+    return sum(len(encoder.entry_pair(m.id, m.timestamp, m.systolic, m.diastolic, m.pulse))
+               for m in result.scalars())
+
+
+async def fhir_core(session, user_id) -> int:
+    encoder = ObservationEncoder(user_id, _observation_bp, _observation_hr)
+    result = await session.execute(measurement_page_query(select(*SEARCHSET_COLUMNS), user_id))
+    return sum(len(encoder.entry_pair(*row)) for row in result)
+
+
+async def _measure(fn, user_id, runs: int):
+    best = float("inf")
+    for _ in range(runs):
+        async with async_session_maker() as session:
+            t0 = time.perf_counter()
+            await fn(session, user_id)
+            best = min(best, time.perf_counter() - t0)
+    async with async_session_maker() as session:
+        tracemalloc.start()
+        await fn(session, user_id)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+async def main(args) -> None:
+    if not args.no_seed:
+        await synthetic.seed(engine, 1, args.measurements)
+    user_id = synthetic.user_ids(1, 1)[0]
+    async with async_session_maker() as session:
+        rows = await session.scalar(select(func.count()).where(Measurement.user_id == user_id))
+    print(f"{rows} rows, best of {args.runs}")
+    variants = (("list orm", list_orm), ("list core", list_core), ("fhir orm", fhir_orm), ("fhir core", fhir_core))
+    for label, fn in variants:
+        seconds, peak = await _measure(fn, user_id, args.runs)
+        print(f"{label:<10} {rows / seconds:>10,.0f} rows/s  peak {peak / 2**20:>7.1f} MiB")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--measurements", type=int, default=100_000, help="Rows to seed")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--no-seed", action="store_true", help="DATABASE_URL already holds benchmarks.synthetic data")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+Latency of GET /measurements/bp while concurrent logins hash passwords.
+Runs the app in-process on SQLite; compare PASSWORD_HASH_WORKERS=0 (hash
+on the event loop) with the default thread pool.
+
+    python -m benchmarks.bench_login_storm [logins] [concurrency]
+    PASSWORD_HASH_WORKERS=0 python -m benchmarks.bench_login_storm
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+_db = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_db}")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("SEND_EMAILS", "false")
+os.environ.setdefault("TEST_FIXED_OTP", "1111")
+
+import httpx
+
+from app.app import app
+from app.db import Base, engine
+from app.passwords import PASSWORD_HASH_CONCURRENCY, PASSWORD_HASH_WORKERS
+
+EMAIL = "bench@example.com"
+PASSWORD = "strongpass123"
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _login(client: httpx.AsyncClient) -> None:
+    r = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+    r.raise_for_status()
+
+
+async def _probe(client: httpx.AsyncClient, headers, stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        r = await client.get("/measurements/bp", params={"limit": 50}, headers=headers)
+        r.raise_for_status()
+        samples.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(0.005)
+
+
+async def main(logins: int = 200, concurrency: int = 20) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        (await client.post("/auth/register", json={"email": EMAIL, "password": PASSWORD})).raise_for_status()
+        (await client.post("/auth/verify-otp", json={"email": EMAIL, "otp": "1111"})).raise_for_status()
+        r = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        idle: list = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, headers, stop, idle))
+        await asyncio.sleep(1.0)
+        stop.set()
+        await probe
+
+        busy: list = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, headers, stop, busy))
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one_login():
+            async with gate:
+                await _login(client)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await probe
+
+    print(f"hash workers={PASSWORD_HASH_WORKERS} concurrency limit={PASSWORD_HASH_CONCURRENCY}")
+    print(f"logins      {logins / elapsed:>10.1f} /s ({logins} total, {concurrency} in flight)")
+    for label, samples in (("idle", idle), ("storm", busy)):
+        print(f"bp {label:<8} p50 {_percentile(samples, 0.5):>8.1f} ms   p99 {_percentile(samples, 0.99):>8.1f} ms"
+              f"   ({len(samples)} requests)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    asyncio.run(main(*args))
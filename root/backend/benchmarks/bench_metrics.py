@@ -0,0 +1,78 @@
+"""
+Overhead of the metrics surface: per-request cost of MetricsMiddleware on a
+minimal FastAPI route, per-statement cost of the SQL timing events, and the
+raw cost of Histogram.observe.
+
+    python -m benchmarks.bench_metrics [requests]
+"""
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import metrics
+
+
+def _make_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+async def _requests_per_second(app: FastAPI, n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(200):
+            await client.get(f"/items/{i}")
+        t0 = time.perf_counter()
+        for i in range(n):
+            await client.get(f"/items/{i}")
+        return n / (time.perf_counter() - t0)
+
+
+async def _statements_per_second(instrumented: bool, n: int) -> float:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    if instrumented:
+        metrics.instrument_engine(engine.sync_engine)
+    async with engine.connect() as conn:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            await conn.execute(text("SELECT 1"))
+        rate = n / (time.perf_counter() - t0)
+    await engine.dispose()
+    return rate
+
+
+def _report(label: str, plain: float, instrumented: float, unit: str) -> None:
+    overhead_us = (1 / instrumented - 1 / plain) * 1e6
+    print(f"{label:<10} {plain:>10,.0f} {unit}/s plain  {instrumented:>10,.0f} {unit}/s instrumented"
+          f"  ({overhead_us:+.1f} us each)")
+
+
+async def main(n: int = 5000) -> None:
+    _report("http", await _requests_per_second(_make_app(False), n),
+            await _requests_per_second(_make_app(True), n), "req")
+    _report("sql", await _statements_per_second(False, n), await _statements_per_second(True, n), "stmt")
+
+    hist = metrics.Histogram("bench_seconds", "bench", ("route",))
+    t0 = time.perf_counter()
+    for i in range(1_000_000):
+        hist.observe(0.003, "/items/{item_id}")
+    print(f"observe    {(time.perf_counter() - t0) * 1000:>10.0f} ns/op")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -0,0 +1,167 @@
+"""
+Concurrent async load generator for the hot paths. Seeds a synthetic data set
+(benchmarks.synthetic), then drives each scenario with --concurrency workers
+for --duration seconds and prints p50/p95/p99 latency and requests/sec as JSON.
+
+By default the app runs in-process on a fresh SQLite file. With --base-url the
+requests go to a running server instead; point DATABASE_URL at the same
+database so the seeded users exist there (and set TEST_FIXED_OTP on the server
+for the verify-otp scenario).
+
+    python -m benchmarks.load_test --users 50 --measurements 2000 --duration 10 --out result.json
+    python -m benchmarks.load_test --scenarios bp_list,fhir_search --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("SEND_EMAILS", "false")
+os.environ.setdefault("TEST_FIXED_OTP", "1111")
+os.environ.setdefault("EMAIL_OUTBOX_WORKER", "false")
+
+import httpx
+
+from benchmarks.synthetic import PASSWORD, seed, user_email
+
+Scenario = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def build_scenarios(users: int, tokens: List[Dict[str, str]]) -> Dict[str, Scenario]:
+    async def bp_list(client, rng):
+        return await client.get("/measurements/bp", params={"limit": 100}, headers=rng.choice(tokens))
+
+    async def fhir_search(client, rng):
+        return await client.get("/fhir/Observation", params={"_count": 100}, headers=rng.choice(tokens))
+
+    async def login(client, rng):
+        email = user_email(rng.randrange(users))
+        return await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+
+    async def verify_otp(client, rng):
+        email = user_email(rng.randrange(users))
+        return await client.post("/auth/verify-otp", json={"email": email, "otp": os.environ["TEST_FIXED_OTP"]})
+
+    return {"bp_list": bp_list, "fhir_search": fhir_search, "login": login, "verify_otp": verify_otp}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, concurrency: int, duration: float, seed_value: int
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed_value * 1000 + index)
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                r = await scenario(client, rng)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - t0)
+            if not ok:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def main(args) -> Dict[str, Any]:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    from app.db import engine
+
+    rows, seed_seconds = (0, 0.0) if args.no_seed else await seed(engine, args.users, args.measurements, args.seed)
+
+    if args.base_url:
+        client = httpx.AsyncClient(
+            base_url=args.base_url,
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency),
+        )
+    else:
+        from app.app import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load", timeout=60)
+
+    async with client:
+        tokens = []
+        for i in range(min(args.users, args.concurrency)):
+            r = await client.post("/auth/login", json={"email": user_email(i), "password": PASSWORD})
+            r.raise_for_status()
+            tokens.append({"Authorization": f"Bearer {r.json()['access_token']}"})
+
+        scenarios = build_scenarios(args.users, tokens)
+        results = {}
+        for name in args.scenarios.split(","):
+            name = name.strip()
+            if name not in scenarios:
+                raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(scenarios)}")
+            results[name] = await run_scenario(client, scenarios[name], args.concurrency, args.duration, args.seed)
+            print(f"{name:<12} {json.dumps(results[name])}", file=sys.stderr)
+
+    await engine.dispose()
+    return {
+        "config": {
+            "users": args.users,
+            "measurements_per_user": args.measurements,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "target": args.base_url or "in-process",
+            "database": engine.url.get_backend_name(),
+            "python": platform.python_version(),
+        },
+        "seed": {"rows": rows, "seconds": round(seed_seconds, 2)},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--measurements", type=int, default=1000, help="Measurements per user")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--scenarios", default="bp_list,fhir_search,login,verify_otp")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-seed", action="store_true", help="Reuse users/measurements seeded by an earlier run")
+    parser.add_argument("--base-url", default=None, help="Target a running server instead of the in-process app")
+    parser.add_argument("--out", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
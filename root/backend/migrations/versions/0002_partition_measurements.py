@@ -0,0 +1,49 @@
+"""partition measurements by month (optional, Postgres)
+
+Only runs with ``alembic -x partitioned=true upgrade head`` or
+MEASUREMENTS_PARTITIONED=true, and only on Postgres; otherwise it is recorded
+as applied without changes. To convert an existing database later, run
+``python -m app.partitions convert``: it rebuilds ``measurements`` only and
+keeps the tables and indexes of later revisions. Don't downgrade to 0001 for
+this, since that also drops everything added by 0003 and later.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 17:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+
+from app import partitions
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _enabled() -> bool:
+    flag = context.get_x_argument(as_dictionary=True).get("partitioned")
+    if flag is None:
+        return partitions.MEASUREMENTS_PARTITIONED
+    return flag.strip().lower() in ("1", "true", "yes")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not _enabled():
+        return
+    if not context.is_offline_mode() and partitions.is_partitioned(bind):
+        return
+    partitions.convert_to_partitioned(bind)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if context.is_offline_mode() or partitions.is_partitioned(bind):
+        partitions.convert_to_plain(bind)
@@ -0,0 +1,43 @@
+"""GIN index on measurements.tags (Postgres)
+
+Serves the tags= filter of GET /measurements/bp. On a large existing table
+create it beforehand without blocking writes, then run the migration (which
+skips an existing index):
+``CREATE INDEX CONCURRENTLY ix_measurements_tags ON measurements USING gin (tags jsonb_path_ops);``
+(on a partitioned table, per partition, then on the parent with ON ONLY and ATTACH).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 18:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.create_index(
+        "ix_measurements_tags",
+        "measurements",
+        ["tags"],
+        postgresql_using="gin",
+        postgresql_ops={"tags": "jsonb_path_ops"},
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_measurements_tags", table_name="measurements", if_exists=True)
@@ -16,6 +16,8 @@ def set_env():
     os.environ.setdefault("SEND_EMAILS", "false")
     os.environ.setdefault("TEST_FIXED_OTP", "1111")
     os.environ.setdefault("AUTO_CREATE_DB_SCHEMA", "false")
+    # The outbox worker would use the app's own engine; tests drain the outbox explicitly
+    os.environ.setdefault("EMAIL_OUTBOX_WORKER", "false")
     # Optional redirect base to build links; not required for tests
     os.environ.setdefault("VERIFY_LINK_BASE", "http://testserver")
     yield
@@ -58,3 +60,17 @@ def app_client(async_session_maker, monkeypatch):
 
     with TestClient(app) as client:
         yield client
+
+
+@pytest.fixture()
+def auth_headers(app_client):
+    # Fresh registered + verified user, returns the bearer header
+    email = f"user-{uuid.uuid4().hex[:8]}@example.com"
+    password = "strongpass123"
+    r = app_client.post("/auth/register", json={"email": email, "password": password})
+    assert r.status_code == 201, r.text
+    r = app_client.post("/auth/verify-otp", json={"email": email, "otp": "1111"})
+    assert r.status_code == 200, r.text
+    r = app_client.post("/auth/login", json={"email": email, "password": password})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
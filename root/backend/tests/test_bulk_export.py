@@ -0,0 +1,114 @@
+import json
+import time
+
+from sqlalchemy import update
+
+
+def _make_superuser(app_client, headers, event_loop, async_session_maker):
+    from app.db import User
+    from app.user_cache import user_cache
+
+    user_id = app_client.get("/users/me", headers=headers).json()["id"]
+
+    async def promote():
+        async with async_session_maker() as session:
+            await session.execute(update(User).where(User.id == user_id).values(is_superuser=True))
+            await session.commit()
+
+    event_loop.run_until_complete(promote())
+    # Direct DB writes bypass the UserManager hooks
+    user_cache.clear()
+
+
+def test_bulk_export_kickoff_status_and_download(
+    app_client, auth_headers, event_loop, async_session_maker, tmp_path, monkeypatch
+):
+    from app import bulk_export
+
+    monkeypatch.setattr(bulk_export, "EXPORT_DIR", tmp_path)
+    r = app_client.get("/fhir/$export", headers={**auth_headers, "Prefer": "respond-async"})
+    assert r.status_code == 403
+
+    _make_superuser(app_client, auth_headers, event_loop, async_session_maker)
+    payload = {"systolic": 118, "diastolic": 76, "pulse": 58, "timestamp": "2024-05-01T07:00:00+00:00"}
+    assert app_client.post("/measurements/bp", json=payload, headers=auth_headers).status_code == 200
+
+    assert app_client.get("/fhir/$export", headers=auth_headers).status_code == 400
+    r = app_client.get("/fhir/$export", headers={**auth_headers, "Prefer": "respond-async"})
+    assert r.status_code == 202, r.text
+    status_url = r.headers["Content-Location"]
+
+    deadline = time.monotonic() + 10
+    while True:
+        r = app_client.get(status_url, headers=auth_headers)
+        if r.status_code != 202 or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert r.status_code == 200, r.text
+    output = r.json()["output"]
+    assert output[0]["type"] == "Observation"
+
+    r = app_client.get(output[0]["url"], headers=auth_headers)
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert len(lines) == output[0]["count"]
+    assert any(res["code"]["coding"][0]["code"] == "85354-9" and res["component"][0]["valueQuantity"]["value"] == 118
+               for res in lines)
+
+    assert app_client.delete(status_url, headers=auth_headers).status_code == 202
+    assert app_client.get(status_url, headers=auth_headers).status_code == 404
+
+
+def test_deleting_a_running_export_stops_it(app_client, auth_headers, event_loop, test_engine, tmp_path, monkeypatch):
+    import uuid
+
+    from app import bulk_export
+    from app.routers.fhir import _observation_bp, _observation_hr
+
+    for day in (1, 2):
+        payload = {"systolic": 118, "diastolic": 76, "pulse": 58, "timestamp": f"2024-05-0{day}T07:00:00+00:00"}
+        assert app_client.post("/measurements/bp", json=payload, headers=auth_headers).status_code == 200
+    monkeypatch.setattr(bulk_export, "EXPORT_CHUNK_ROWS", 1)
+    job_id = str(uuid.uuid4())
+    path = tmp_path / job_id
+    path.mkdir()
+    monkeypatch.setattr(bulk_export, "EXPORT_DIR", tmp_path)
+
+    def build_bp(meas, user_id):
+        # The client deletes the job while the first chunk is being encoded
+        bulk_export.delete_job(job_id)
+        return _observation_bp(meas, user_id)
+
+    event_loop.run_until_complete(
+        bulk_export._run_export(job_id, path, test_engine.url, "http://test/fhir/$export", build_bp, _observation_hr)
+    )
+    assert not path.exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_export_without_heartbeat_is_reported_as_failed(tmp_path, monkeypatch):
+    import os
+    import socket
+    import uuid
+
+    from app import bulk_export
+
+    monkeypatch.setattr(bulk_export, "EXPORT_DIR", tmp_path)
+    running, queued = str(uuid.uuid4()), str(uuid.uuid4())
+    (tmp_path / running).mkdir()
+    (tmp_path / running / bulk_export.PROGRESS).write_text(json.dumps({"rows": 7, "heartbeat": time.time()}))
+    assert bulk_export.job_status(running) == {"state": "running", "rows": 7}
+
+    # The export process died mid-run: its heartbeat stops advancing
+    stale = time.time() - bulk_export.EXPORT_STALE_SECONDS - 1
+    (tmp_path / running / bulk_export.PROGRESS).write_text(json.dumps({"rows": 7, "heartbeat": stale}))
+    assert bulk_export.job_status(running)["state"] == "error"
+    assert (tmp_path / running / bulk_export.ERROR).exists()
+
+    # Queued by a process that has since exited, never picked up
+    (tmp_path / queued).mkdir()
+    job = {"host": socket.gethostname(), "pid": os.getpid(), "queued": time.time()}
+    (tmp_path / queued / bulk_export.JOB).write_text(json.dumps(job))
+    assert bulk_export.job_status(queued) == {"state": "running", "rows": None}
+    monkeypatch.setattr(bulk_export, "_process_alive", lambda pid: False)
+    assert bulk_export.job_status(queued)["state"] == "error"
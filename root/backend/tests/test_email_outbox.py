@@ -0,0 +1,53 @@
+import uuid
+
+from sqlalchemy import delete, select
+
+
+def test_register_queues_otp_email_and_worker_delivers_it(app_client, event_loop, async_session_maker):
+    from app.db import EmailOutbox
+    from app.email_outbox import EmailSendError, LogTransport, OutboxWorker
+
+    # Rows queued by other tests would otherwise fill the batch ahead of ours
+    async def clear_outbox():
+        async with async_session_maker() as session:
+            await session.execute(delete(EmailOutbox))
+            await session.commit()
+
+    event_loop.run_until_complete(clear_outbox())
+    email = f"outbox-{uuid.uuid4().hex[:8]}@example.com"
+    r = app_client.post("/auth/register", json={"email": email, "password": "strongpass123"})
+    assert r.status_code == 201, r.text
+
+    class FlakyTransport(LogTransport):
+        fail = True
+
+        async def send(self, to_email, subject, html):
+            if self.fail and to_email == email:
+                self.fail = False
+                raise EmailSendError("503 from provider")
+            return await super().send(to_email, subject, html)
+
+    transport = FlakyTransport()
+    worker = OutboxWorker(async_session_maker, transport)
+
+    async def drain_and_load():
+        await worker.drain_once()
+        async with async_session_maker() as session:
+            result = await session.execute(select(EmailOutbox).where(EmailOutbox.to_email == email))
+            return result.scalar_one()
+
+    row = event_loop.run_until_complete(drain_and_load())
+    assert row.attempts == 1 and row.sent_at is None
+    assert row.next_attempt_at is not None and row.last_error == "503 from provider"
+
+    async def make_due():
+        async with async_session_maker() as session:
+            due = await session.get(EmailOutbox, row.id)
+            due.next_attempt_at = due.created_at
+            await session.commit()
+
+    event_loop.run_until_complete(make_due())
+    row = event_loop.run_until_complete(drain_and_load())
+    assert row.attempts == 2 and row.sent_at is not None and row.next_attempt_at is None
+    sent = [m for m in transport.sent if m["to"] == email]
+    assert len(sent) == 1 and "1111" in sent[0]["html"]
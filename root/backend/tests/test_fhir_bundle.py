@@ -0,0 +1,94 @@
+def _bp(sys_, dia, when, members=None):
+    res = {
+        "resourceType": "Observation",
+        "status": "final",
+        "code": {"coding": [{"system": "http://loinc.org", "code": "85354-9"}]},
+        "effectiveDateTime": when,
+        "component": [
+            {"code": {"coding": [{"system": "http://loinc.org", "code": "8480-6"}]}, "valueQuantity": {"value": sys_}},
+            {"code": {"coding": [{"system": "http://loinc.org", "code": "8462-4"}]}, "valueQuantity": {"value": dia}},
+        ],
+    }
+    if members:
+        res["hasMember"] = [{"reference": m} for m in members]
+    return res
+
+
+def _hr(value, when=None):
+    res = {
+        "resourceType": "Observation",
+        "status": "final",
+        "code": {"coding": [{"system": "http://loinc.org", "code": "8867-4"}]},
+        "valueQuantity": {"value": value, "unit": "/min"},
+    }
+    if when:
+        res["effectiveDateTime"] = when
+    return res
+
+
+def test_transaction_bundle_pairs_all_panels(app_client, auth_headers):
+    bundle = {
+        "resourceType": "Bundle",
+        "type": "transaction",
+        "entry": [
+            {"fullUrl": "urn:uuid:bp-1", "resource": _bp(121, 81, "2024-04-01T08:00:00Z", ["urn:uuid:hr-1"])},
+            {"fullUrl": "urn:uuid:bp-2", "resource": _bp(131, 85, "2024-04-02T08:00:00Z")},
+            {"fullUrl": "urn:uuid:hr-2", "resource": _hr(71, "2024-04-02T08:00:00+00:00")},
+            {"fullUrl": "urn:uuid:hr-1", "resource": _hr(61)},
+        ],
+    }
+    r = app_client.post("/fhir/Observation", json=bundle, headers=auth_headers)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["type"] == "transaction-response"
+    statuses = [e["response"]["status"] for e in body["entry"]]
+    assert statuses == ["201 Created"] * 4
+    assert body["entry"][3]["response"]["location"] == body["entry"][0]["response"]["location"] + "-hr"
+
+    items = app_client.get("/measurements/bp", headers=auth_headers).json()
+    assert sorted((m["systolic"], m["pulse"]) for m in items) == [(121, 61), (131, 71)]
+
+
+def test_transaction_is_atomic_and_batch_is_not(app_client, auth_headers):
+    entries = [
+        {"resource": _bp(140, 90, "2024-04-03T08:00:00Z")},
+        {"resource": _hr(70, "2024-04-03T08:00:00Z")},
+        {"resource": _bp(150, 95, "2024-04-04T08:00:00Z")},  # no heart rate
+    ]
+    r = app_client.post(
+        "/fhir/Observation", json={"resourceType": "Bundle", "type": "transaction", "entry": entries},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+    assert app_client.get("/measurements/bp", headers=auth_headers).json() == []
+
+    r = app_client.post(
+        "/fhir/Observation", json={"resourceType": "Bundle", "type": "batch", "entry": entries},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200, r.text
+    statuses = [e["response"]["status"] for e in r.json()["entry"]]
+    assert statuses == ["201 Created", "201 Created", "400 Bad Request"]
+    assert len(app_client.get("/measurements/bp", headers=auth_headers).json()) == 1
+
+
+def test_malformed_has_member_is_rejected(app_client, auth_headers):
+    panel = _bp(128, 84, "2024-04-05T08:00:00Z")
+    panel["hasMember"] = None
+    entries = [{"resource": panel}, {"resource": _hr(66, "2024-04-05T08:00:00Z")}]
+    r = app_client.post(
+        "/fhir/Observation", json={"resourceType": "Bundle", "type": "transaction", "entry": entries},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400
+    assert "hasMember" in r.json()["detail"]
+
+    r = app_client.post(
+        "/fhir/Observation", json={"resourceType": "Bundle", "type": "batch", "entry": entries},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200, r.text
+    first = r.json()["entry"][0]["response"]
+    assert first["status"] == "400 Bad Request"
+    assert first["outcome"]["resourceType"] == "OperationOutcome"
+    assert app_client.get("/measurements/bp", headers=auth_headers).json() == []
@@ -0,0 +1,30 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+
+
+def _rows():
+    helsinki = timezone(timedelta(hours=3))
+    yield SimpleNamespace(id=uuid.uuid4(), timestamp=datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc),
+                          systolic=123, diastolic=77, pulse=65)
+    yield SimpleNamespace(id=uuid.uuid4(), timestamp=datetime(2024, 6, 30, 7, 5, 9, 123456, tzinfo=helsinki),
+                          systolic=95, diastolic=60, pulse=48)
+    # SQLite hands back naive datetimes
+    yield SimpleNamespace(id=uuid.uuid4(), timestamp=datetime(2023, 12, 31, 23, 59, 59),
+                          systolic=210, diastolic=130, pulse=140)
+
+
+def test_entry_pair_is_byte_identical_to_builder_output():
+    from app.fhir_encoder import ObservationEncoder, dumps
+    from app.routers.fhir import _observation_bp, _observation_hr
+
+    user_id = uuid.uuid4()
+    encoder = ObservationEncoder(user_id, _observation_bp, _observation_hr)
+    for m in _rows():
+        expected = (
+            dumps({"fullUrl": f"urn:uuid:{m.id}", "resource": _observation_bp(m, user_id)})
+            + ","
+            + dumps({"fullUrl": f"urn:uuid:{m.id}-hr", "resource": _observation_hr(m, user_id)})
+        ).encode()
+        assert encoder.entry_pair(m.id, m.timestamp, m.systolic, m.diastolic, m.pulse) == expected
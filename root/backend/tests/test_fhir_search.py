@@ -0,0 +1,50 @@
+def _seed(app_client, headers, n):
+    for i in range(n):
+        payload = {
+            "systolic": 120 + i,
+            "diastolic": 80,
+            "pulse": 60 + i,
+            "timestamp": f"2024-02-{i + 1:02d}T08:00:00+00:00",
+        }
+        r = app_client.post("/measurements/bp", json=payload, headers=headers)
+        assert r.status_code == 200, r.text
+
+
+def test_fhir_searchset_unpaged_has_total(app_client, auth_headers):
+    _seed(app_client, auth_headers, 3)
+    r = app_client.get("/fhir/Observation", headers=auth_headers)
+    assert r.status_code == 200, r.text
+    bundle = r.json()
+    assert bundle["type"] == "searchset"
+    assert bundle["total"] == 6
+    assert [link["relation"] for link in bundle["link"]] == ["self"]
+
+
+def test_fhir_searchset_count_follows_next_links(app_client, auth_headers):
+    _seed(app_client, auth_headers, 5)
+
+    ids = []
+    url = "/fhir/Observation?_count=4"
+    pages = 0
+    while url:
+        r = app_client.get(url, headers=auth_headers)
+        assert r.status_code == 200, r.text
+        bundle = r.json()
+        assert "total" not in bundle
+        assert len(bundle["entry"]) <= 4
+        ids.extend(e["resource"]["id"] for e in bundle["entry"])
+        nxt = [link["url"] for link in bundle["link"] if link["relation"] == "next"]
+        url = nxt[0] if nxt else None
+        pages += 1
+
+    assert pages == 3
+    assert len(ids) == 10 and len(set(ids)) == 10
+
+
+def test_fhir_searchset_count_bounds_entries(app_client, auth_headers):
+    _seed(app_client, auth_headers, 2)
+    r = app_client.get("/fhir/Observation?_count=3", headers=auth_headers)
+    assert r.status_code == 200, r.text
+    assert len(r.json()["entry"]) == 2
+    # A page can't be smaller than one BP/HR pair
+    assert app_client.get("/fhir/Observation?_count=1", headers=auth_headers).status_code == 422
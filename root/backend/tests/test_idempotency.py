@@ -0,0 +1,138 @@
+BP = {"systolic": 124, "diastolic": 82, "pulse": 68, "timestamp": "2024-06-01T08:00:00+00:00"}
+
+
+def _observation(identifier=None, systolic=126):
+    obs = {
+        "resourceType": "Observation",
+        "status": "final",
+        "code": {"coding": [{"system": "http://loinc.org", "code": "85354-9"}]},
+        "effectiveDateTime": "2024-06-02T08:00:00+00:00",
+        "component": [
+            {"code": {"coding": [{"system": "http://loinc.org", "code": "8480-6"}]},
+             "valueQuantity": {"value": systolic, "unit": "mmHg"}},
+            {"code": {"coding": [{"system": "http://loinc.org", "code": "8462-4"}]},
+             "valueQuantity": {"value": 84, "unit": "mmHg"}},
+            {"code": {"coding": [{"system": "http://loinc.org", "code": "8867-4"}]},
+             "valueQuantity": {"value": 70, "unit": "/min"}},
+        ],
+    }
+    if identifier:
+        obs["identifier"] = [{"system": "urn:cuff:serial-1", "value": identifier}]
+    return obs
+
+
+def test_create_bp_retry_with_idempotency_key_returns_original(app_client, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "reading-1"}
+    first = app_client.post("/measurements/bp", json=BP, headers=headers)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    etag = app_client.get("/measurements/bp", headers=auth_headers).headers["ETag"]
+
+    retry = app_client.post("/measurements/bp", json=BP, headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    listed = app_client.get("/measurements/bp", headers=auth_headers)
+    assert [it["id"] for it in listed.json()] == [first.json()["id"]]
+    # Nothing was written, so clients' cached lists stay valid
+    assert listed.headers["ETag"] == etag
+
+    other = app_client.post("/measurements/bp", json={**BP, "systolic": 150}, headers=headers)
+    assert other.status_code == 422
+    assert other.json()["detail"] == "IDEMPOTENCY_KEY_REUSED"
+
+    # Keys are per user and unkeyed requests are not deduplicated
+    assert app_client.post("/measurements/bp", json=BP, headers=auth_headers).status_code == 200
+    assert len(app_client.get("/measurements/bp", headers=auth_headers).json()) == 2
+
+    r = app_client.post("/measurements/bp", json=BP, headers={**auth_headers, "Idempotency-Key": "x" * 256})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "INVALID_IDEMPOTENCY_KEY"
+
+
+def test_fhir_observation_identifier_deduplicates(app_client, auth_headers):
+    first = app_client.post("/fhir/Observation", json=_observation("abc-1"), headers=auth_headers)
+    assert first.status_code == 200
+    retry = app_client.post("/fhir/Observation", json=_observation("abc-1"), headers=auth_headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    # Same Observations (ids compared: SQLite drops the offset of the stored timestamp)
+    ids = [e["resource"]["id"] for e in first.json()["entry"]]
+    assert [e["resource"]["id"] for e in retry.json()["entry"]] == ids
+
+    changed = app_client.post("/fhir/Observation", json=_observation("abc-1", systolic=140), headers=auth_headers)
+    assert changed.status_code == 422
+
+    second = app_client.post("/fhir/Observation", json=_observation("abc-2"), headers=auth_headers)
+    assert second.json()["entry"][0]["resource"]["id"] != first.json()["entry"][0]["resource"]["id"]
+    header_keyed = {**auth_headers, "Idempotency-Key": "fhir-1"}
+    assert app_client.post("/fhir/Observation", json=_observation(), headers=header_keyed).status_code == 200
+    assert app_client.post("/fhir/Observation", json=_observation(), headers=header_keyed).status_code == 200
+    assert len(app_client.get("/measurements/bp", headers=auth_headers).json()) == 3
+
+
+def test_same_reading_replays_across_endpoints(app_client, auth_headers):
+    reading = {"systolic": 126, "diastolic": 84, "pulse": 70, "timestamp": "2024-06-02T08:00:00+00:00"}
+    headers = {**auth_headers, "Idempotency-Key": "urn:cuff:serial-1|abc-9"}
+    first = app_client.post("/measurements/bp", json=reading, headers=headers)
+    assert first.status_code == 200
+
+    # The client retries the same reading as a FHIR Observation, alone and as a Bundle entry
+    retry = app_client.post("/fhir/Observation", json=_observation(), headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["entry"][0]["resource"]["id"] == first.json()["id"]
+    bundle = {"resourceType": "Bundle", "type": "batch", "entry": [{"resource": _observation("abc-9")}]}
+    entry = app_client.post("/fhir/Observation", json=bundle, headers=auth_headers).json()["entry"][0]
+    assert entry["response"] == {"status": "200 OK", "location": f"Observation/{first.json()['id']}"}
+    assert len(app_client.get("/measurements/bp", headers=auth_headers).json()) == 1
+
+
+def _bundle(bundle_type, *observations):
+    return {"resourceType": "Bundle", "type": bundle_type, "entry": [{"resource": o} for o in observations]}
+
+
+def test_bundle_retry_returns_original_observations(app_client, auth_headers):
+    bundle = _bundle("transaction", _observation(systolic=121), _observation(systolic=122))
+    headers = {**auth_headers, "Idempotency-Key": "bundle-1"}
+    first = app_client.post("/fhir/Observation", json=bundle, headers=headers)
+    assert [e["response"]["status"] for e in first.json()["entry"]] == ["201 Created"] * 2
+    etag = app_client.get("/measurements/bp", headers=auth_headers).headers["ETag"]
+
+    retry = app_client.post("/fhir/Observation", json=bundle, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert [e["response"]["status"] for e in retry.json()["entry"]] == ["200 OK"] * 2
+    locations = [e["response"]["location"] for e in first.json()["entry"]]
+    assert [e["response"]["location"] for e in retry.json()["entry"]] == locations
+    assert app_client.get("/measurements/bp", headers=auth_headers).headers["ETag"] == etag
+    assert len(app_client.get("/measurements/bp", headers=auth_headers).json()) == 2
+
+    changed = _bundle("transaction", _observation(systolic=121), _observation(systolic=150))
+    assert app_client.post("/fhir/Observation", json=changed, headers=headers).status_code == 422
+
+    # Without a header, panel identifiers deduplicate entry by entry
+    batch = _bundle("batch", _observation("dev-1"), _observation("dev-2"))
+    first = app_client.post("/fhir/Observation", json=batch, headers=auth_headers).json()
+    batch["entry"].append({"resource": _observation("dev-3")})
+    batch["entry"][1]["resource"]["component"][0]["valueQuantity"]["value"] = 140
+    retry = app_client.post("/fhir/Observation", json=batch, headers=auth_headers).json()
+    statuses = [e["response"]["status"] for e in retry["entry"]]
+    assert statuses == ["200 OK", "400 Bad Request", "201 Created"]
+    assert retry["entry"][0]["response"]["location"] == first["entry"][0]["response"]["location"]
+    assert len(app_client.get("/measurements/bp", headers=auth_headers).json()) == 5
+
+
+def test_bp_batch_retry_with_idempotency_key(app_client, auth_headers):
+    items = [BP, {**BP, "systolic": "high"}, {**BP, "timestamp": "2024-06-03T08:00:00+00:00"}]
+    headers = {**auth_headers, "Idempotency-Key": "import-1"}
+    first = app_client.post("/measurements/bp/batch", json=items, headers=headers)
+    assert first.json()["inserted"] == 2
+
+    retry = app_client.post("/measurements/bp/batch", json=items, headers=headers)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["ids"] == first.json()["ids"] and retry.json()["inserted"] == 0
+    assert len(app_client.get("/measurements/bp", headers=auth_headers).json()) == 2
+
+    other = app_client.post("/measurements/bp/batch", json=items[:1], headers=headers)
+    assert other.status_code == 422
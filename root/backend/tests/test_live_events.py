@@ -0,0 +1,114 @@
+import json
+import uuid
+
+from app import live, metrics
+
+BP = {"systolic": 131, "diastolic": 86, "pulse": 72, "timestamp": "2024-07-01T08:00:00+00:00"}
+
+
+def _events(subscription):
+    events = []
+    for raw in subscription.events:
+        head, data = raw.decode().strip().split("\n")
+        events.append((head.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def _user_id(app_client, headers):
+    return uuid.UUID(app_client.get("/users/me", headers=headers).json()["id"])
+
+
+def test_writes_are_pushed_to_the_users_subscriptions(app_client, auth_headers):
+    user_id = _user_id(app_client, auth_headers)
+    first, second = live.broker.subscribe(user_id), live.broker.subscribe(user_id)
+    other = live.broker.subscribe(uuid.uuid4())
+    try:
+        created = app_client.post("/measurements/bp", json=BP, headers=auth_headers).json()["id"]
+        app_client.post("/measurements/bp/batch", json=[{**BP, "timestamp": "2024-07-02T08:00:00+00:00"}],
+                        headers=auth_headers)
+        app_client.delete(f"/measurements/bp/{created}", headers=auth_headers)
+
+        events = _events(first)
+        assert [t for t, _ in events] == ["created", "created", "deleted"]
+        item = events[0][1]["items"][0]
+        assert item["id"] == created and item["systolic"] == 131 and item["userId"] == str(user_id)
+        assert events[2][1] == {"ids": [created]}
+        # Fan-out shares the encoded bytes
+        assert list(first.events) == list(second.events)
+        assert first.events[0] is second.events[0]
+        assert not other.events
+    finally:
+        for subscription in (first, second, other):
+            live.broker.unsubscribe(subscription)
+
+
+def test_events_go_out_with_the_commit_only(event_loop, async_session_maker):
+    user_id = uuid.uuid4()
+    subscription = live.broker.subscribe(user_id)
+
+    async def write(commit):
+        async with async_session_maker() as session:
+            await live.publish_deleted(session, user_id, [uuid.uuid4()])
+            assert not subscription.events
+            if commit:
+                await session.commit()
+            else:
+                await session.rollback()
+
+    published = metrics.live_events.value("deleted")
+    try:
+        event_loop.run_until_complete(write(commit=False))
+        assert not subscription.events
+        assert metrics.live_events.value("deleted") == published
+        event_loop.run_until_complete(write(commit=True))
+        assert [t for t, _ in _events(subscription)] == ["deleted"]
+        assert metrics.live_events.value("deleted") == published + 1
+    finally:
+        live.broker.unsubscribe(subscription)
+
+
+def test_slow_subscriber_gets_one_resync(event_loop, monkeypatch):
+    monkeypatch.setattr(live, "LIVE_QUEUE_SIZE", 3)
+    user_id = uuid.uuid4()
+    subscription = live.broker.subscribe(user_id)
+    resyncs = metrics.live_resyncs.value()
+    for n in range(10):
+        live.broker.deliver(user_id, "deleted", {"ids": [str(n)]})
+    assert subscription.overflowed and not subscription.events
+    assert metrics.live_resyncs.value() == resyncs + 1
+
+    async def read(count):
+        stream = live.event_stream(subscription, {"etag": '"x"'})
+        chunks = [await stream.__anext__() for _ in range(count)]
+        await stream.aclose()
+        return chunks
+
+    live.broker.deliver(user_id, "deleted", {"ids": ["late"]})
+    chunks = event_loop.run_until_complete(read(2))
+    assert chunks[0].startswith(b"event: ready\n")
+    assert chunks[1] == live.RESYNC
+    # Closing the stream ends the subscription
+    assert user_id not in live.broker._subscriptions
+
+
+def test_subscription_limit_per_user(app_client, auth_headers, monkeypatch):
+    monkeypatch.setattr(live, "LIVE_MAX_SUBSCRIPTIONS_PER_USER", 1)
+    held = live.broker.subscribe(_user_id(app_client, auth_headers))
+    try:
+        r = app_client.get("/measurements/bp/events", headers=auth_headers)
+        assert r.status_code == 429
+        assert r.json()["detail"] == "TOO_MANY_SUBSCRIPTIONS"
+    finally:
+        live.broker.unsubscribe(held)
+    assert app_client.get("/measurements/bp/events").status_code == 401
+
+
+def test_large_writes_are_announced_as_resync(app_client, auth_headers, monkeypatch):
+    monkeypatch.setattr(live, "LIVE_MAX_EVENT_ITEMS", 1)
+    subscription = live.broker.subscribe(_user_id(app_client, auth_headers))
+    try:
+        batch = [{**BP, "timestamp": f"2024-07-0{d}T08:00:00+00:00"} for d in (3, 4)]
+        app_client.post("/measurements/bp/batch", json=batch, headers=auth_headers)
+        assert list(subscription.events) == [live.RESYNC]
+    finally:
+        live.broker.unsubscribe(subscription)
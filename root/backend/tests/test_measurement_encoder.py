@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.responses import JSONResponse
+
+
+def _rows():
+    helsinki = timezone(timedelta(hours=3))
+    yield (uuid.uuid4(), datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc), 123, 77, 65, ["home", "morning"], None)
+    yield (uuid.uuid4(), datetime(2024, 6, 30, 7, 5, 9, 123456, tzinfo=helsinki), 95, 60, 48, None,
+           'Huimasi, "100%" varma \\ ¯\\_(ツ)_/¯\n')
+    # SQLite hands back naive datetimes
+    yield (uuid.uuid4(), datetime(2023, 12, 31, 23, 59, 59), 210, 130, 140, [], "")
+
+
+def test_array_is_byte_identical_to_json_response():
+    from app.measurement_encoder import MeasurementListEncoder
+
+    user_id = uuid.uuid4()
+    rows = list(_rows())
+    expected = JSONResponse(
+        [
+            {
+                "id": str(meas_id),
+                "userId": str(user_id),
+                "systolic": systolic,
+                "diastolic": diastolic,
+                "pulse": pulse,
+                "timestamp": timestamp.isoformat(),
+                "tags": tags or [],
+                "notes": notes,
+            }
+            for meas_id, timestamp, systolic, diastolic, pulse, tags, notes in rows
+        ]
+    ).body
+    encoder = MeasurementListEncoder(user_id)
+    assert encoder.array(rows) == expected
+    assert encoder.array([]) == b"[]"
@@ -0,0 +1,51 @@
+def _add(app_client, headers, day, tags):
+    payload = {
+        "systolic": 110 + day,
+        "diastolic": 75,
+        "pulse": 65,
+        "timestamp": f"2024-06-{day:02d}T07:30:00+00:00",
+        "tags": tags,
+    }
+    r = app_client.post("/measurements/bp", json=payload, headers=headers)
+    assert r.status_code == 200, r.text
+
+
+def _seed(app_client, headers):
+    _add(app_client, headers, 1, ["home", "morning"])
+    _add(app_client, headers, 2, ["clinic"])
+    _add(app_client, headers, 3, ["home", "evening"])
+    _add(app_client, headers, 4, [])
+
+
+def test_list_bp_filters_by_tags(app_client, auth_headers):
+    _seed(app_client, auth_headers)
+
+    def systolics(params):
+        r = app_client.get("/measurements/bp", params=params, headers=auth_headers)
+        assert r.status_code == 200, r.text
+        return [m["systolic"] for m in r.json()]
+
+    assert systolics({"tags": "home"}) == [113, 111]
+    assert systolics({"tags": "clinic,evening"}) == [113, 112]
+    assert systolics({"tags": ["home", "morning"], "tags_match": "all"}) == [111]
+    assert systolics({"tags": "home", "limit": 1}) == [113]
+    assert systolics({"tags": "nope"}) == []
+
+    r = app_client.get("/measurements/bp", params={"tags": ",".join(f"t{i}" for i in range(21))}, headers=auth_headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "TOO_MANY_TAGS"
+
+
+def test_tag_facets(app_client, auth_headers):
+    _seed(app_client, auth_headers)
+    r = app_client.get("/measurements/bp/tags", headers=auth_headers)
+    assert r.status_code == 200
+    assert r.json()["tags"] == [
+        {"tag": "home", "count": 2},
+        {"tag": "clinic", "count": 1},
+        {"tag": "evening", "count": 1},
+        {"tag": "morning", "count": 1},
+    ]
+
+    r = app_client.get("/measurements/bp/tags", params={"from": "2024-06-02T00:00:00+00:00"}, headers=auth_headers)
+    assert r.json()["tags"] == [{"tag": "clinic", "count": 1}, {"tag": "evening", "count": 1}, {"tag": "home", "count": 1}]
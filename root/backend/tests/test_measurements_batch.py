@@ -0,0 +1,17 @@
+def test_batch_insert_reports_item_errors_and_keeps_valid_rows(app_client, auth_headers):
+    items = [
+        {"systolic": 120 + i, "diastolic": 80, "pulse": 60, "timestamp": f"2024-03-{i + 1:02d}T08:00:00+00:00"}
+        for i in range(4)
+    ]
+    items.insert(2, {"systolic": "high", "diastolic": 80, "pulse": 60, "timestamp": "2024-03-10T08:00:00Z"})
+
+    r = app_client.post("/measurements/bp/batch", json=items, headers=auth_headers)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["inserted"] == 4
+    assert body["ok"] is False
+    assert [e["index"] for e in body["errors"]] == [2]
+    assert body["ids"][2] is None and all(body["ids"][i] for i in (0, 1, 3, 4))
+
+    r = app_client.get("/measurements/bp", headers=auth_headers)
+    assert sorted(it["id"] for it in r.json()) == sorted(i for i in body["ids"] if i)
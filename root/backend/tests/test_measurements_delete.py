@@ -0,0 +1,62 @@
+import uuid
+
+
+def _add(app_client, headers, day, tags=None):
+    payload = {
+        "systolic": 120 + day,
+        "diastolic": 80,
+        "pulse": 60,
+        "timestamp": f"2024-05-{day:02d}T08:00:00+00:00",
+        "tags": tags,
+    }
+    r = app_client.post("/measurements/bp", json=payload, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def _systolics(app_client, headers):
+    return [m["systolic"] for m in app_client.get("/measurements/bp", headers=headers).json()]
+
+
+def test_delete_single_measurement(app_client, auth_headers):
+    measurement_id = _add(app_client, auth_headers, 1)
+    r = app_client.delete(f"/measurements/bp/{measurement_id}", headers=auth_headers)
+    assert r.status_code == 200
+    assert r.json() == {"ok": True, "id": measurement_id}
+    r = app_client.delete(f"/measurements/bp/{measurement_id}", headers=auth_headers)
+    assert r.status_code == 404
+    assert r.json()["detail"] == "MEASUREMENT_NOT_FOUND"
+
+
+def test_bulk_delete_by_ids_and_by_range_with_tag(app_client, auth_headers):
+    ids = [_add(app_client, auth_headers, day, ["cuff-b"] if day in (3, 4) else ["cuff-a"]) for day in range(1, 7)]
+
+    r = app_client.post("/measurements/bp/delete", json={"ids": ids[:2] + [str(uuid.uuid4())]}, headers=auth_headers)
+    assert r.status_code == 200
+    assert r.json()["deleted"] == 2
+    assert sorted(r.json()["ids"]) == sorted(ids[:2])
+    assert _systolics(app_client, auth_headers) == [126, 125, 124, 123]
+
+    selection = {"from": "2024-05-01T00:00:00+00:00", "to": "2024-05-06T00:00:00+00:00", "tag": "cuff-b"}
+    r = app_client.post("/measurements/bp/delete", json=selection, headers=auth_headers)
+    assert r.json()["deleted"] == 2
+    assert _systolics(app_client, auth_headers) == [126, 125]
+
+    r = app_client.post("/measurements/bp/delete", json={"from": "2024-05-05T00:00:00+00:00"}, headers=auth_headers)
+    assert r.json()["deleted"] == 2
+    assert _systolics(app_client, auth_headers) == []
+
+
+def test_bulk_delete_needs_a_selection_and_only_touches_own_rows(app_client, auth_headers):
+    r = app_client.post("/measurements/bp/delete", json={"tag": "cuff-a"}, headers=auth_headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "DELETE_SELECTION_REQUIRED"
+
+    mine = _add(app_client, auth_headers, 9)
+    email = f"other-{uuid.uuid4().hex[:8]}@example.com"
+    app_client.post("/auth/register", json={"email": email, "password": "strongpass123"})
+    app_client.post("/auth/verify-otp", json={"email": email, "otp": "1111"})
+    token = app_client.post("/auth/login", json={"email": email, "password": "strongpass123"}).json()["access_token"]
+    r = app_client.post("/measurements/bp/delete", json={"ids": [mine]}, headers={"Authorization": f"Bearer {token}"})
+    assert r.json()["deleted"] == 0
+    assert _systolics(app_client, auth_headers) == [129]
@@ -0,0 +1,70 @@
+import uuid
+
+from sqlalchemy import event
+
+BP = {"systolic": 121, "diastolic": 79, "pulse": 61, "timestamp": "2024-02-01T08:00:00+00:00"}
+
+
+def test_list_bp_conditional_get(app_client, auth_headers, test_engine):
+    r = app_client.get("/measurements/bp", headers=auth_headers)
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        r = app_client.get("/measurements/bp", headers={**auth_headers, "If-None-Match": etag})
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+    assert r.status_code == 304
+    assert r.headers["ETag"] == etag
+    assert r.content == b""
+    # Only the version lookup ran, not the list query
+    assert not any("FROM measurements" in s for s in statements)
+
+    r = app_client.post("/measurements/bp", json=BP, headers=auth_headers)
+    assert r.status_code == 200
+    measurement_id = r.json()["id"]
+    r = app_client.get("/measurements/bp", headers={**auth_headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert len(r.json()) == 1
+    created = r.headers["ETag"]
+    assert created != etag
+
+    app_client.delete(f"/measurements/bp/{measurement_id}", headers=auth_headers)
+    r = app_client.get("/measurements/bp", headers={**auth_headers, "If-None-Match": f'W/{created}'})
+    assert r.status_code == 200
+    assert r.json() == []
+
+
+def test_fhir_search_conditional_get(app_client, auth_headers):
+    r = app_client.get("/fhir/Observation", headers=auth_headers)
+    etag = r.headers["ETag"]
+    r = app_client.get("/fhir/Observation", headers={**auth_headers, "If-None-Match": f'"other", {etag}'})
+    assert r.status_code == 304
+
+    app_client.post("/measurements/bp/batch", json=[BP], headers=auth_headers)
+    r = app_client.get("/fhir/Observation", headers={**auth_headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert len(r.json()["entry"]) == 2
+
+
+def test_etag_differs_between_users(app_client, auth_headers):
+    first = app_client.get("/measurements/bp", headers=auth_headers).headers["ETag"]
+    email = f"etag-{uuid.uuid4().hex[:8]}@example.com"
+    app_client.post("/auth/register", json={"email": email, "password": "strongpass123"})
+    app_client.post("/auth/verify-otp", json={"email": email, "otp": "1111"})
+    token = app_client.post("/auth/login", json={"email": email, "password": "strongpass123"}).json()["access_token"]
+    r = app_client.get("/measurements/bp", headers={"Authorization": f"Bearer {token}", "If-None-Match": first})
+    assert r.status_code == 200
+
+
+def test_browser_clients_can_read_etag(app_client, auth_headers):
+    r = app_client.get("/measurements/bp", headers={**auth_headers, "Origin": "http://localhost:5173"})
+    exposed = [h.strip().lower() for h in r.headers["Access-Control-Expose-Headers"].split(",")]
+    assert "etag" in exposed and "idempotent-replayed" in exposed
@@ -0,0 +1,62 @@
+def _seed(app_client, headers, n):
+    for i in range(n):
+        payload = {
+            "systolic": 120 + i,
+            "diastolic": 80,
+            "pulse": 60,
+            "timestamp": f"2024-01-{i + 1:02d}T08:00:00+00:00",
+        }
+        r = app_client.post("/measurements/bp", json=payload, headers=headers)
+        assert r.status_code == 200, r.text
+
+
+def test_list_bp_keyset_pages_cover_history_once(app_client, auth_headers):
+    _seed(app_client, auth_headers, 7)
+
+    seen = []
+    params = {"limit": 3}
+    while True:
+        r = app_client.get("/measurements/bp", params=params, headers=auth_headers)
+        assert r.status_code == 200, r.text
+        seen.extend(it["systolic"] for it in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        assert 'rel="next"' in r.headers["Link"]
+        params = {"limit": 3, "cursor": cursor}
+
+    assert seen == [126, 125, 124, 123, 122, 121, 120]
+
+
+def test_list_bp_time_range_and_bad_cursor(app_client, auth_headers):
+    _seed(app_client, auth_headers, 5)
+
+    r = app_client.get(
+        "/measurements/bp",
+        params={"from": "2024-01-02T00:00:00+00:00", "to": "2024-01-04T00:00:00+00:00"},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200, r.text
+    assert [it["systolic"] for it in r.json()] == [122, 121]
+
+    r = app_client.get("/measurements/bp", params={"cursor": "not-a-cursor"}, headers=auth_headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "INVALID_CURSOR"
+
+
+def test_list_bp_is_paged_by_default_and_unpaged_on_request(app_client, auth_headers, monkeypatch):
+    from app.routers import measurements
+
+    monkeypatch.setattr(measurements, "DEFAULT_PAGE_SIZE", 2)
+    _seed(app_client, auth_headers, 5)
+
+    r = app_client.get("/measurements/bp", headers=auth_headers)
+    assert [it["systolic"] for it in r.json()] == [124, 123]
+    r = app_client.get("/measurements/bp", params={"cursor": r.headers["X-Next-Cursor"]}, headers=auth_headers)
+    assert [it["systolic"] for it in r.json()] == [122, 121]
+
+    r = app_client.get("/measurements/bp", params={"all": "true"}, headers=auth_headers)
+    assert len(r.json()) == 5 and "X-Next-Cursor" not in r.headers
+    r = app_client.get("/measurements/bp", params={"all": "true", "limit": 2}, headers=auth_headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "ALL_WITH_PAGING"
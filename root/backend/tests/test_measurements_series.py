@@ -0,0 +1,35 @@
+from app.downsample import lttb
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    xs = list(range(100))
+    ys = [0.0] * 100
+    ys[37] = 50.0
+    ys[71] = -40.0
+    picked = lttb(xs, ys, 10)
+    assert len(picked) == 10
+    assert picked[0] == 0 and picked[-1] == 99
+    assert picked == sorted(picked)
+    assert 37 in picked and 71 in picked
+    assert lttb(xs[:5], ys[:5], 10) == [0, 1, 2, 3, 4]
+
+
+def test_bp_series_downsamples_each_metric(app_client, auth_headers):
+    items = [
+        {"systolic": 120 + i % 7, "diastolic": 80, "pulse": 60 + i % 3, "timestamp": f"2024-04-01T{i // 60:02d}:{i % 60:02d}:00Z"}
+        for i in range(120)
+    ]
+    assert app_client.post("/measurements/bp/batch", json=items, headers=auth_headers).status_code == 200
+
+    r = app_client.get("/measurements/bp/series", params={"points": 20}, headers=auth_headers)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["total"] == 120
+    for name in ("systolic", "diastolic", "pulse"):
+        assert len(body[name]) == 20
+    xs = [x for x, _ in body["systolic"]]
+    assert xs == sorted(xs)
+    assert xs[0] == 1711929600000 and body["systolic"][0][1] == 120
+
+    r = app_client.get("/measurements/bp/series", params={"points": 2}, headers=auth_headers)
+    assert r.status_code == 422
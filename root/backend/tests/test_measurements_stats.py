@@ -0,0 +1,27 @@
+def test_bp_stats_buckets_by_local_day_and_splits_morning_evening(app_client, auth_headers):
+    readings = [
+        ("2024-02-05T07:00:00+00:00", 120, 80, 60),
+        ("2024-02-05T19:00:00+00:00", 130, 84, 70),
+        ("2024-02-06T08:00:00+00:00", 140, 90, 64),
+        ("2024-02-12T08:00:00+00:00", 110, 70, 58),
+    ]
+    items = [{"systolic": s, "diastolic": d, "pulse": p, "timestamp": ts} for ts, s, d, p in readings]
+    assert app_client.post("/measurements/bp/batch", json=items, headers=auth_headers).status_code == 200
+
+    r = app_client.get("/measurements/bp/stats", params={"bucket": "day"}, headers=auth_headers)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [b["start"] for b in body["buckets"]] == ["2024-02-05", "2024-02-06", "2024-02-12"]
+    first = body["buckets"][0]
+    assert first["count"] == 2
+    assert first["systolic"] == {"mean": 125.0, "min": 120, "max": 130}
+    assert first["morning"] == {"count": 1, "systolic": 120.0, "diastolic": 80.0, "pulse": 60.0}
+    assert first["evening"]["count"] == 1 and first["evening"]["pulse"] == 70.0
+
+    r = app_client.get("/measurements/bp/stats", params={"bucket": "week", "to": "2024-02-10T00:00:00Z"},
+                       headers=auth_headers)
+    assert [(b["start"], b["count"]) for b in r.json()["buckets"]] == [("2024-02-05", 3)]
+
+    r = app_client.get("/measurements/bp/stats", params={"tz": "Mars/Olympus"}, headers=auth_headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "INVALID_TIMEZONE"
@@ -0,0 +1,57 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+
+def test_middleware_records_route_template_status_and_render():
+    from app import metrics
+
+    mini = FastAPI()
+    mini.add_middleware(metrics.MetricsMiddleware)
+
+    @mini.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    before = metrics.http_latency.count("GET", "/items/{item_id}")
+    with TestClient(mini) as client:
+        assert client.get("/items/1").status_code == 200
+        assert client.get("/items/2").status_code == 200
+        assert client.get("/items/x").status_code == 422
+        assert client.get("/nope").status_code == 404
+
+    assert metrics.http_latency.count("GET", "/items/{item_id}") == before + 3
+    assert metrics.http_requests.value("GET", "/items/{item_id}", "422") >= 1
+    assert metrics.http_requests.value("GET", "unmatched", "404") >= 1
+    assert metrics.http_in_flight.value() == 0
+
+    body = metrics.render()
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/items/{item_id}",le="+Inf"}' in body
+
+
+def test_sql_fingerprints_and_domain_counters(app_client, auth_headers, test_engine, event_loop):
+    from app import metrics
+
+    assert metrics.fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?),\n (?, ?)") == \
+        "INSERT INTO t (a, b) VALUES (?, ?), ..."
+    assert metrics.fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (...)"
+
+    metrics.instrument_engine(test_engine.sync_engine)
+
+    async def run():
+        async with test_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    before = metrics.db_query_latency.count("SELECT 1")
+    event_loop.run_until_complete(run())
+    assert metrics.db_query_latency.count("SELECT 1") == before + 1
+
+    inserted = metrics.measurements_inserted.value("batch")
+    items = [{"systolic": 120, "diastolic": 80, "pulse": 60, "timestamp": "2024-06-01T08:00:00Z"}] * 3
+    assert app_client.post("/measurements/bp/batch", json=items, headers=auth_headers).status_code == 200
+    assert metrics.measurements_inserted.value("batch") == inserted + 3
+    assert metrics.logins.value("success") >= 1
+
+    # Not exposed unless METRICS_ENABLED
+    assert app_client.get("/metrics").status_code == 404
@@ -0,0 +1,138 @@
+import os
+import uuid
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+# postgresql+asyncpg URL of a scratch database; its public schema is wiped
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def test_month_arithmetic_and_names():
+    from app.partitions import add_months, month_start, partition_name
+
+    assert month_start(date(2024, 2, 29)) == date(2024, 2, 1)
+    assert add_months(date(2024, 11, 1), 2) == date(2025, 1, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partition_name(date(2025, 3, 1)) == "measurements_y2025m03"
+
+
+def _alembic_config(url: str) -> Config:
+    cfg = Config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+    cfg.set_main_option("sqlalchemy.url", url)
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def test_migrations_upgrade_and_downgrade_on_sqlite(tmp_path):
+    db = tmp_path / "migrations.db"
+    cfg = _alembic_config(f"sqlite+aiosqlite:///{db}")
+
+    # 0002 is Postgres-only and a no-op here, even when partitioning is requested
+    cfg.cmd_opts = type("Opts", (), {"x": ["partitioned=true"]})()
+    command.upgrade(cfg, "head")
+    engine = create_engine(f"sqlite:///{db}")
+    tables = set(inspect(engine).get_table_names())
+    expected = {
+        "user", "oauth_accounts", "measurements", "measurement_versions", "measurement_client_keys",
+        "email_outbox", "alembic_version",
+    }
+    assert expected <= tables
+    indexes = {i["name"] for i in inspect(engine).get_indexes("measurements")}
+    assert "ix_measurements_user_id_timestamp" in indexes
+
+    command.downgrade(cfg, "base")
+    assert set(inspect(engine).get_table_names()) == {"alembic_version"}
+    engine.dispose()
+
+
+@pytest.mark.skipif(TEST_POSTGRES_URL is None, reason="needs TEST_POSTGRES_URL")
+def test_convert_database_at_head_keeps_later_revisions(event_loop):
+    from app import partitions
+    from app.db import SCHEMA_REVISION
+
+    engine = create_async_engine(TEST_POSTGRES_URL, poolclass=NullPool)
+    user_id = uuid.uuid4()
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP SCHEMA public CASCADE"))
+            await conn.execute(text("CREATE SCHEMA public"))
+
+    async def seed_and_convert():
+        async with engine.begin() as conn:
+            await conn.execute(
+                text('INSERT INTO "user" (id, email, hashed_password, is_active, is_superuser, is_verified) '
+                     "VALUES (:id, 'p@example.com', 'x', true, false, true)"),
+                {"id": user_id},
+            )
+            await conn.execute(
+                text("INSERT INTO measurements (id, user_id, systolic, diastolic, pulse, timestamp, tags) "
+                     "VALUES (:id, :user_id, 120, 80, 60, :ts, '[\"home\"]')"),
+                {"id": uuid.uuid4(), "user_id": user_id, "ts": datetime(2024, 3, 1, tzinfo=timezone.utc)},
+            )
+            await conn.execute(text("INSERT INTO measurement_versions VALUES (:id, 7)"), {"id": user_id})
+            await conn.execute(
+                text("INSERT INTO measurement_client_keys (user_id, key, measurement_id, request_hash) "
+                     "VALUES (:id, 'k', :m, 'h')"),
+                {"id": user_id, "m": uuid.uuid4()},
+            )
+        async with engine.begin() as conn:
+            await conn.run_sync(partitions.convert_to_partitioned)
+        async with engine.connect() as conn:
+            return {
+                "partitioned": await conn.run_sync(partitions.is_partitioned),
+                "revision": await conn.scalar(text("SELECT version_num FROM alembic_version")),
+                "measurements": await conn.scalar(text("SELECT count(*) FROM measurements")),
+                "version": await conn.scalar(text("SELECT version FROM measurement_versions")),
+                "keys": await conn.scalar(text("SELECT count(*) FROM measurement_client_keys")),
+                "tags_index": await conn.scalar(text("SELECT to_regclass('ix_measurements_tags') IS NOT NULL")),
+            }
+
+    event_loop.run_until_complete(reset())
+    command.upgrade(_alembic_config(TEST_POSTGRES_URL), "head")
+    state = event_loop.run_until_complete(seed_and_convert())
+    event_loop.run_until_complete(engine.dispose())
+    assert state == {
+        "partitioned": True, "revision": SCHEMA_REVISION, "measurements": 1, "version": 7, "keys": 1,
+        "tags_index": True,
+    }
+
+
+@pytest.mark.skipif(TEST_POSTGRES_URL is None, reason="needs TEST_POSTGRES_URL")
+def test_maintainer_recreates_upcoming_partitions(event_loop):
+    import asyncio
+
+    from app import partitions
+
+    engine = create_async_engine(TEST_POSTGRES_URL, poolclass=NullPool)
+    upcoming = partitions.partition_name(partitions.add_months(partitions.month_start(date.today()), 2))
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP SCHEMA public CASCADE"))
+            await conn.execute(text("CREATE SCHEMA public"))
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP TABLE "{upcoming}"'))
+        maintainer = partitions.PartitionMaintainer(engine, interval=0.05)
+        maintainer.start()
+        await asyncio.sleep(0.5)
+        await maintainer.stop()
+        async with engine.connect() as conn:
+            names = [name for name, _ in await conn.run_sync(partitions.list_partitions)]
+        await engine.dispose()
+        return names
+
+    event_loop.run_until_complete(reset())
+    cfg = _alembic_config(TEST_POSTGRES_URL)
+    cfg.cmd_opts = type("Opts", (), {"x": ["partitioned=true"]})()
+    command.upgrade(cfg, "head")
+    assert upcoming in event_loop.run_until_complete(run())
@@ -0,0 +1,30 @@
+def test_ready_reports_pool_counters(app_client):
+    r = app_client.get("/ready")
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["status"] == "ok"
+    # The session serving this request holds one connection
+    assert body["pool"]["checked_out"] >= 1
+    assert {"size", "idle", "overflow"} <= body["pool"].keys()
+
+
+def test_timed_pool_counts_checkouts_and_wait(event_loop, tmp_path):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.db import TimedQueuePool, pool_status
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=2)
+
+    async def use():
+        for _ in range(3):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        status = pool_status(engine.pool)
+        await engine.dispose()
+        return status
+
+    status = event_loop.run_until_complete(use())
+    assert status["checkouts"] == 3 and status["timeouts"] == 0
+    assert status["idle"] == 1 and status["checked_out"] == 0
+    assert status["wait_seconds_total"] >= 0
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import metrics, replica
+
+BP = {"systolic": 118, "diastolic": 76, "pulse": 64, "timestamp": "2024-04-01T08:00:00+00:00"}
+
+
+def _use_replica(monkeypatch, url):
+    from app import db as app_db
+
+    engine = create_async_engine(url, poolclass=NullPool)
+    monkeypatch.setattr(app_db, "replica_session_maker",
+                        sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+    monkeypatch.setattr(replica, "_recent_writes", {})
+    monkeypatch.setattr(replica, "_replica_down_until", 0.0)
+
+
+@pytest.fixture()
+def replica_client(app_client, monkeypatch):
+    # The "replica" is a second engine over the test database, so it sees the primary's writes at once
+    _use_replica(monkeypatch, "sqlite+aiosqlite:///./test.db")
+    return app_client
+
+
+def test_reads_go_to_replica_except_right_after_a_write(replica_client, auth_headers, monkeypatch):
+    before = metrics.db_read_sessions.value("replica")
+    r = replica_client.get("/measurements/bp", headers=auth_headers)
+    assert r.status_code == 200
+    assert metrics.db_read_sessions.value("replica") == before + 1
+    replica_client.get("/fhir/Observation", headers=auth_headers)
+    replica_client.get("/measurements/bp/stats", headers=auth_headers)
+    assert metrics.db_read_sessions.value("replica") == before + 3
+
+    # Read-your-writes: the writer's next reads stay on the primary within the sticky window
+    assert replica_client.post("/measurements/bp", json=BP, headers=auth_headers).status_code == 200
+    primary = metrics.db_read_sessions.value("primary")
+    r = replica_client.get("/measurements/bp", headers=auth_headers)
+    assert [it["systolic"] for it in r.json()] == [118]
+    assert metrics.db_read_sessions.value("primary") == primary + 1
+    assert metrics.db_read_sessions.value("replica") == before + 3
+
+    monkeypatch.setattr(replica, "REPLICA_STICKY_SECONDS", 0)
+    replica._recent_writes.clear()
+    replica_client.get("/measurements/bp", headers=auth_headers)
+    assert metrics.db_read_sessions.value("replica") == before + 4
+
+
+def test_unreachable_replica_falls_back_to_primary(app_client, auth_headers, monkeypatch, tmp_path):
+    _use_replica(monkeypatch, f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    fallbacks = metrics.db_replica_fallbacks.value()
+    r = app_client.get("/measurements/bp", headers=auth_headers)
+    assert r.status_code == 200
+    assert metrics.db_replica_fallbacks.value() == fallbacks + 1
+    assert not replica.replica_available()
+
+    # Within the retry window the replica isn't tried again
+    assert app_client.get("/measurements/bp", headers=auth_headers).status_code == 200
+    assert metrics.db_replica_fallbacks.value() == fallbacks + 1
@@ -0,0 +1,51 @@
+import uuid
+
+from app.response_cache import InProcessBackend
+
+BP = {"systolic": 130, "diastolic": 85, "pulse": 70, "timestamp": "2024-03-01T08:00:00+00:00"}
+
+
+def test_list_responses_are_cached_and_invalidated_by_writes(app_client, auth_headers, monkeypatch):
+    from app.response_cache import response_cache
+
+    monkeypatch.setattr(response_cache, "enabled", True)
+    app_client.post("/measurements/bp", json=BP, headers=auth_headers)
+
+    hits = response_cache.hits
+    first = app_client.get("/measurements/bp", params={"limit": 10}, headers=auth_headers)
+    second = app_client.get("/measurements/bp", params={"limit": 10}, headers=auth_headers)
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert response_cache.hits == hits + 1
+
+    fhir = app_client.get("/fhir/Observation", headers=auth_headers)
+    assert app_client.get("/fhir/Observation", headers=auth_headers).content == fhir.content
+    assert response_cache.hits == hits + 2
+
+    user_id = uuid.UUID(first.json()[0]["userId"])
+    assert user_id in response_cache.backend._by_user
+    later = {**BP, "systolic": 140, "timestamp": "2024-03-02T08:00:00+00:00"}
+    app_client.post("/measurements/bp", json=later, headers=auth_headers)
+    assert user_id not in response_cache.backend._by_user
+
+    r = app_client.get("/measurements/bp", params={"limit": 10}, headers=auth_headers)
+    assert [it["systolic"] for it in r.json()] == [140, 130]
+    assert app_client.get("/ready").json()["response_cache"]["hits"] == response_cache.hits
+
+
+def test_in_process_backend_evicts_least_recently_used_by_bytes():
+    backend = InProcessBackend(max_bytes=250)
+    user = uuid.uuid4()
+    for name in ("a", "b", "c"):
+        backend.set((user, name), (b"x" * 100, {}))
+    assert backend.stats() == {"entries": 2, "bytes": 200}
+    assert backend.get((user, "a")) is None
+
+    backend.get((user, "b"))
+    backend.set((user, "d"), (b"x" * 100, {}))
+    assert backend.get((user, "b")) is not None
+    assert backend.get((user, "c")) is None
+
+    backend.invalidate(user)
+    assert backend.stats() == {"entries": 0, "bytes": 0}
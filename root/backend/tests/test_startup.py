@@ -0,0 +1,44 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db import SCHEMA_REVISION, check_schema_revision
+from app.startup_profile import by_package, parse_importtime
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def test_schema_revision_matches_migration_head():
+    assert ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head() == SCHEMA_REVISION
+
+
+def test_check_schema_revision(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'schema.db'}"
+    engine = create_async_engine(url)
+    with pytest.raises(RuntimeError, match="revision none"):
+        asyncio.run(check_schema_revision(engine))
+
+    cfg = Config(str(ALEMBIC_INI))
+    cfg.set_main_option("sqlalchemy.url", url)
+    cfg.attributes["configure_logger"] = False
+    command.upgrade(cfg, "head")
+    asyncio.run(check_schema_revision(engine))
+    asyncio.run(engine.dispose())
+
+
+def test_import_time_report_parsing():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     sqlalchemy.util",
+        "import time:       300 |        420 |   sqlalchemy",
+        "import time:        50 |        50 |   app.db",
+        "import time:        10 |        480 | app",
+    ])
+    rows = parse_importtime(output)
+    assert rows[0] == ("sqlalchemy.util", 120, 120)
+    assert by_package(rows) == {"sqlalchemy": 420, "app": 60}
@@ -0,0 +1,36 @@
+import uuid
+
+
+def test_authenticated_user_is_cached_and_invalidated_on_update(app_client, auth_headers):
+    from app.user_cache import user_cache
+
+    me = app_client.get("/users/me", headers=auth_headers).json()
+    user_id = uuid.UUID(me["id"])
+    assert user_id in user_cache._entries
+
+    hits = user_cache.hits
+    r = app_client.get("/measurements/bp", headers=auth_headers)
+    assert r.status_code == 200
+    assert user_cache.hits == hits + 1
+
+    r = app_client.patch("/users/me", json={"email": f"new-{uuid.uuid4().hex[:8]}@example.com"}, headers=auth_headers)
+    assert r.status_code == 200, r.text
+    assert user_id not in user_cache._entries
+
+    # The next lookup reloads the updated row
+    assert app_client.get("/users/me", headers=auth_headers).json()["email"] == r.json()["email"]
+
+
+def test_cache_hits_show_in_metrics_and_ready(app_client, auth_headers):
+    from app import metrics
+
+    app_client.get("/users/me", headers=auth_headers)
+    hits, misses = metrics.user_cache_requests.value("hit"), metrics.user_cache_requests.value("miss")
+    ready_hits = app_client.get("/ready").json()["user_cache"]["hits"]
+
+    # Served by the cached UserManager.get
+    assert app_client.get("/users/me", headers=auth_headers).status_code == 200
+    assert metrics.user_cache_requests.value("hit") == hits + 1
+    assert metrics.user_cache_requests.value("miss") == misses
+    assert app_client.get("/ready").json()["user_cache"]["hits"] == ready_hits + 1
+    assert 'user_cache_requests_total{result="hit"}' in metrics.render()
@@ -0,0 +1,139 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app import metrics, write_coalescer
+
+BP = {"systolic": 119, "diastolic": 77, "pulse": 66, "timestamp": "2024-05-01T08:00:00+00:00"}
+
+
+def _row(user_id, minute, systolic=120):
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "systolic": systolic,
+        "diastolic": 80,
+        "pulse": 60,
+        "timestamp": datetime(2024, 5, 2, 8, tzinfo=timezone.utc) + timedelta(minutes=minute),
+        "tags": [],
+        "notes": None,
+    }
+
+
+def test_concurrent_submits_share_one_commit(app_client, auth_headers, event_loop, async_session_maker):
+    from app.db import Measurement, MeasurementVersion
+
+    user_id = uuid.UUID(app_client.get("/users/me", headers=auth_headers).json()["id"])
+    writer = write_coalescer.MeasurementWriter(async_session_maker, max_rows=100, max_wait=0.05)
+    batches = metrics.coalesced_batch_rows.count()
+
+    async def run():
+        writer.start()
+        try:
+            await asyncio.gather(*(writer.submit(_row(user_id, i)) for i in range(40)))
+        finally:
+            await writer.stop()
+        async with async_session_maker() as session:
+            stored = await session.scalar(select(func.count()).where(Measurement.user_id == user_id))
+            version = await session.scalar(
+                select(MeasurementVersion.version).where(MeasurementVersion.user_id == user_id)
+            )
+        return stored, version
+
+    stored, version = event_loop.run_until_complete(run())
+    assert stored == 40
+    assert version == 1
+    assert metrics.coalesced_batch_rows.count() == batches + 1
+
+
+def test_submit_after_stop_writes_directly(app_client, auth_headers, event_loop, async_session_maker):
+    from app.db import Measurement
+
+    user_id = uuid.UUID(app_client.get("/users/me", headers=auth_headers).json()["id"])
+    writer = write_coalescer.MeasurementWriter(async_session_maker, max_rows=100, max_wait=0.05)
+
+    async def run():
+        writer.start()
+        await writer.submit(_row(user_id, 0))
+        await writer.stop()
+        # A request that picked up the writer before shutdown must not wait on a queue nobody drains
+        await asyncio.wait_for(writer.submit(_row(user_id, 1)), 5)
+        async with async_session_maker() as session:
+            return await session.scalar(select(func.count()).where(Measurement.user_id == user_id))
+
+    assert event_loop.run_until_complete(run()) == 2
+
+
+def test_failing_row_only_fails_its_own_request(app_client, auth_headers, event_loop, async_session_maker):
+    from app.db import Measurement
+
+    user_id = uuid.UUID(app_client.get("/users/me", headers=auth_headers).json()["id"])
+    writer = write_coalescer.MeasurementWriter(async_session_maker, max_rows=100, max_wait=0.05)
+
+    async def run():
+        writer.start()
+        try:
+            rows = [_row(user_id, 0), _row(user_id, 1, systolic=None), _row(user_id, 2)]
+            results = await asyncio.gather(*(writer.submit(r) for r in rows), return_exceptions=True)
+        finally:
+            await writer.stop()
+        async with async_session_maker() as session:
+            stored = await session.scalar(select(func.count()).where(Measurement.user_id == user_id))
+        return results, stored
+
+    results, stored = event_loop.run_until_complete(run())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], Exception)
+    assert stored == 2
+
+
+def test_failing_notification_does_not_retry_committed_rows(
+    app_client, auth_headers, event_loop, async_session_maker, monkeypatch
+):
+    from app.db import Measurement
+
+    def broken(user_id):
+        raise RuntimeError("cache unavailable")
+
+    monkeypatch.setattr(write_coalescer.response_cache, "invalidate", broken)
+    user_id = uuid.UUID(app_client.get("/users/me", headers=auth_headers).json()["id"])
+    writer = write_coalescer.MeasurementWriter(async_session_maker, max_rows=100, max_wait=0.05)
+
+    async def run():
+        writer.start()
+        try:
+            rows = [_row(user_id, 30 + i) for i in range(3)]
+            results = await asyncio.gather(*(writer.submit(r) for r in rows), return_exceptions=True)
+        finally:
+            await writer.stop()
+        async with async_session_maker() as session:
+            stored = await session.scalar(
+                select(func.count()).where(Measurement.id.in_([r["id"] for r in rows]))
+            )
+        return results, stored
+
+    results, stored = event_loop.run_until_complete(run())
+    assert results == [None, None, None]
+    assert stored == 3
+
+
+def test_create_bp_goes_through_the_writer(app_client, auth_headers, async_session_maker, monkeypatch):
+    from app import app as app_module
+
+    monkeypatch.setattr(write_coalescer, "WRITE_COALESCING_ENABLED", True)
+    # The writer uses the app's session maker, not the overridden request dependency
+    monkeypatch.setattr(app_module, "async_session_maker", async_session_maker)
+    batches = metrics.coalesced_batch_rows.count()
+    with TestClient(app_module.app) as client:
+        assert write_coalescer.writer is not None
+        etag = client.get("/measurements/bp", headers=auth_headers).headers["ETag"]
+        r = client.post("/measurements/bp", json=BP, headers=auth_headers)
+        assert r.status_code == 200
+        listed = client.get("/measurements/bp", headers=auth_headers)
+        assert [it["id"] for it in listed.json()] == [r.json()["id"]]
+        assert listed.headers["ETag"] != etag
+    assert write_coalescer.writer is None
+    assert metrics.coalesced_batch_rows.count() == batches + 1
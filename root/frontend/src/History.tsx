@@ -34,7 +34,7 @@ const History: React.FC = ({currentUser}) => {
 
     const getMeasurements = async () => {
         try {
-            const response = await api.get("/measurements/bp");
+            const response = await api.get("/measurements/bp", { params: { all: true } });
             response.data.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
             const measurements = response.data;
             measurements.forEach((measurement) => {